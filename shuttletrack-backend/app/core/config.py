@@ -11,11 +11,80 @@ except Exception:
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./shuttle.db"
+    # BusLocation and the rollup tables live here (app/db/session.py);
+    # set to "" to keep them in DATABASE_URL
+    TELEMETRY_DATABASE_URL: str = "sqlite:///./telemetry.db"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     SECRET_KEY: str = "CHANGE_THIS_TO_A_SECURE_RANDOM_KEY"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
     FRONTEND_ORIGINS: List[str] = ["http://localhost:3000"]
 
+    # GPS ingest filter (see app/services/ingest_filter.py)
+    INGEST_MIN_MOVE_METERS: float = 15.0
+    INGEST_MIN_INTERVAL_SECONDS: float = 2.0
+    INGEST_MAX_SPEED_MPS: float = 40.0
+    INGEST_MAX_ACCURACY_METERS: float = 150.0
+    INGEST_STATIONARY_KEEPALIVE_SECONDS: float = 15.0
+    INGEST_STATIONARY_MAX_KEEPALIVE_SECONDS: float = 120.0
+    INGEST_BUS_RECHECK_SECONDS: float = 60.0  # re-verify the Bus row this often on HTTP ingest
+    # Client sequence numbers (see app/services/ingest_sequence.py)
+    INGEST_SEQ_WINDOW: int = 64               # reorder window per bus
+    INGEST_SEQ_RESET_GAP: int = 10_000        # this far below the mark = new numbering
+
+    # Rate limiting / admission control (see app/core/ratelimit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_INGEST_PER_SECOND: float = 2.0   # per bus
+    RATE_LIMIT_INGEST_BURST: float = 10
+    RATE_LIMIT_LOGIN_PER_SECOND: float = 0.2    # per client IP (12/min)
+    RATE_LIMIT_LOGIN_BURST: float = 5
+    RATE_LIMIT_WS_CONNECT_PER_SECOND: float = 0.5  # per client IP
+    RATE_LIMIT_WS_CONNECT_BURST: float = 10
+    RATE_LIMIT_WRITE_PER_SECOND: float = 1.0    # per user, authenticated writes
+    RATE_LIMIT_WRITE_BURST: float = 20
+    # Reverse proxies whose X-Forwarded-For is trusted (peer IPs, or "*" for any).
+    # Empty: use the socket peer address. REQUIRED behind a load balancer such as
+    # Render's, or every client shares the proxy's rate-limit buckets (README).
+    TRUSTED_PROXIES: List[str] = []
+    WS_MAX_CONNECTIONS: int = 500  # global subscriber capacity per process
+
+    # Live-position grid index for /buses/nearby (~1.1 km cells)
+    GEO_CELL_DEGREES: float = 0.01
+
+    # In-app scheduler and its jobs (app/services/scheduler.py, app/services/jobs.py)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LEASE_SECONDS: float = 30.0
+    BUS_STALE_SECONDS: float = 120.0          # no fix for this long -> bus_offline
+    STALE_CHECK_INTERVAL_SECONDS: float = 15.0
+    LIVE_WRITEBACK_INTERVAL_SECONDS: float = 10.0
+    TELEMETRY_RETENTION_DAYS: int = 30
+    TELEMETRY_RETENTION_INTERVAL_SECONDS: float = 3600.0
+    LIVE_CHECKPOINT_PATH: str = "./live_state.bin"   # "" disables warm restarts
+    LIVE_CHECKPOINT_INTERVAL_SECONDS: float = 5.0
+    LIVE_HISTORY_SIZE: int = 8                # recent fixes kept per bus
+    SUMMARY_RECONCILE_INTERVAL_SECONDS: float = 60.0
+
+    # Segment travel-time rollups
+    SEGMENT_ROLLUP_INTERVAL_SECONDS: float = 300.0
+    SEGMENT_BUCKET_MINUTES: int = 60
+    SEGMENT_TZ_OFFSET_MINUTES: int = 330      # bucket by local time (IST)
+    SEGMENT_STOP_RADIUS_METERS: float = 75.0
+    SEGMENT_MAX_SECONDS: float = 2 * 3600.0   # longer traversals are discarded
+
+    # Driver ingest WebSocket (/ws/driver/{bus_id}) batched acks
+    DRIVER_WS_ACK_EVERY: int = 10
+    DRIVER_WS_ACK_INTERVAL_SECONDS: float = 2.0
+
+    # On-demand request profiling (X-Profile: <admin JWT>, see app/core/profiling.py)
+    PROFILING_ENABLED: bool = True
+    PROFILE_SAMPLE_INTERVAL_MS: float = 1.0
+    PROFILE_MAX_REPORTS: int = 20
+
+    # Fast read path for list endpoints (?fast=true, or on by default here)
+    FAST_READ_PATH: bool = False
+    FAST_JSON_COMPRESS_MIN_BYTES: int = 1024
+    FAST_CACHE_TTL_SECONDS: float = 5.0
+
     class Config:
         env_file = ".env"
 
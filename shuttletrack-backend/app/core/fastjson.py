@@ -0,0 +1,101 @@
+# app/core/fastjson.py
+"""
+Fast JSON encoding and response compression for hot read endpoints.
+
+orjson and brotli are optional: when they are not installed we fall back to
+the stdlib json encoder and gzip, so the fast path still works, just slower.
+"""
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), default=_default, ensure_ascii=False).encode()
+
+
+def _accepted_codings(header: str) -> Dict[str, float]:
+    """Parses Accept-Encoding into ``{coding: q}``; malformed q-values count as 0."""
+    codings: Dict[str, float] = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+                if not 0.0 <= q <= 1.0:  # also rejects nan
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+    codings = _accepted_codings(request.headers.get("accept-encoding", ""))
+    wildcard = codings.get("*", 0.0)
+    best, best_q = None, 0.0
+    # in order of preference: on equal q, brotli wins
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=5)
+
+
+def json_bytes_response(
+    request: Request,
+    body: bytes,
+    variants: Optional[Dict[str, bytes]] = None,
+) -> Response:
+    """
+    Wraps pre-rendered JSON bytes in a Response, compressing large payloads
+    with the best encoding the client accepts. ``variants`` is an optional
+    per-encoding cache that compressed bodies are read from / stored into.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= settings.FAST_JSON_COMPRESS_MIN_BYTES:
+        encoding = negotiate_encoding(request)
+        if encoding:
+            encoded = variants.get(encoding) if variants is not None else None
+            if encoded is None:
+                encoded = compress(body, encoding)
+                if variants is not None:
+                    variants[encoding] = encoded
+            headers["Content-Encoding"] = encoding
+            body = encoded
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,287 @@
+# app/core/profiling.py
+"""
+On-demand request profiling and SQL query budgets.
+
+Profiling is opt-in per request: send an admin JWT in the ``X-Profile``
+header and that one request runs under a sampling profiler. (Header only: a
+query parameter would leave the token in access logs.) The report is stored in memory (last
+PROFILE_MAX_REPORTS) and its id comes back in the ``X-Profile-Id`` response
+header; fetch it from ``GET /admin/profiles/{id}``. It contains:
+
+- wall time, CPU samples folded by stack (flamegraph-ready), and the
+  hottest functions by self and cumulative samples;
+- every SQL statement the request executed, with its engine and timing
+  (captured through a context variable set here and read by the engine
+  events in app/db/session.py).
+
+A sampler rather than cProfile because sync endpoints run in the thread
+pool, where a profiler enabled on the event loop thread never sees them.
+The sampler walks every thread's stack and keeps the ones inside ``app/``.
+Other requests running at the same moment can therefore show up in the
+profile. Profile on a quiet worker.
+
+``query_budget`` is the CI side (tests/test_query_budgets.py): wrap a
+TestClient call and it fails with the offending statements listed when an
+endpoint runs more queries or takes longer than its budget::
+
+    with query_budget(max_queries=3, max_ms=50) as budget:
+        client.get("/buses?fast=false", headers=budget.headers)
+
+Only statements run in the budget's context are counted, never scheduler
+jobs or other concurrent work. That includes TestClient requests, since the
+portal carries the caller's context into the app. Requests that carry the
+budget's ``X-Query-Budget`` id are bound to it by the middleware as well,
+for setups where the context does not carry over.
+"""
+import os
+import sys
+import threading
+import uuid
+from collections import Counter as Tally, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(APP_DIR)
+
+# (engine name, statement, seconds) for each statement of a profiled request
+sql_capture: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar("sql_capture", default=None)
+
+_reports: "OrderedDict[str, dict]" = OrderedDict()
+# open query budgets by id (X-Query-Budget header value)
+_budgets: Dict[str, List[Tuple[str, str, float]]] = {}
+
+
+# ------------------------------------------------------------------------------
+# Sampling profiler
+# ------------------------------------------------------------------------------
+def _label(code) -> str:
+    path = code.co_filename
+    if path.startswith(ROOT_DIR):
+        path = os.path.relpath(path, ROOT_DIR)
+    elif "site-packages" + os.sep in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval_s: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval_s = interval_s
+        self.stacks: Tally = Tally()
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self._halt.wait(self.interval_s):
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(APP_DIR)
+                    stack.append(code)
+                    frame = frame.f_back
+                if in_app:
+                    stack.reverse()
+                    self.stacks[tuple(stack)] += 1  # code objects; labelled once, in the report
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+
+def _top(tally: Tally, limit: int) -> List[dict]:
+    return [{"function": name, "samples": n} for name, n in tally.most_common(limit)]
+
+
+def build_report(method: str, path: str, status: str, wall_s: float, sampler: Sampler, sql) -> dict:
+    labels: Dict[object, str] = {}
+    folded: Tally = Tally()
+    for codes, n in sampler.stacks.items():
+        folded[tuple(labels.get(c) or labels.setdefault(c, _label(c)) for c in codes)] += n
+
+    self_samples: Tally = Tally()
+    cumulative: Tally = Tally()
+    for stack, n in folded.items():
+        self_samples[stack[-1]] += n
+        for name in set(stack):
+            cumulative[name] += n
+    return {
+        "method": method,
+        "path": path,
+        "status": status,
+        "wall_ms": round(wall_s * 1000, 2),
+        "sample_interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+        "samples": sampler.samples,
+        "top_self": _top(self_samples, 25),
+        "top_cumulative": _top(cumulative, 25),
+        "folded": [f"{';'.join(stack)} {n}" for stack, n in folded.most_common(200)],
+        "sql_count": len(sql),
+        "sql_ms": round(sum(s for _db, _stmt, s in sql) * 1000, 2),
+        "sql": [{"db": db, "statement": stmt, "ms": round(s * 1000, 3)} for db, stmt, s in sql],
+    }
+
+
+def store_report(report_id: str, report: dict) -> None:
+    report["id"] = report_id
+    _reports[report_id] = report
+    while len(_reports) > settings.PROFILE_MAX_REPORTS:
+        _reports.popitem(last=False)
+
+
+def get_report(report_id: str) -> Optional[dict]:
+    return _reports.get(report_id)
+
+
+def list_reports() -> List[dict]:
+    return [
+        {k: r[k] for k in ("id", "method", "path", "status", "wall_ms", "sql_count")}
+        for r in reversed(_reports.values())
+    ]
+
+
+# ------------------------------------------------------------------------------
+# Middleware
+# ------------------------------------------------------------------------------
+def _header(scope, wanted: bytes) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == wanted:
+            return value.decode("latin-1")
+    return None
+
+
+def _profile_requested(scope) -> bool:
+    token = _header(scope, b"x-profile")
+    if not token:
+        return False
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return False
+    return payload.get("role") == "admin"
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI; a no-op unless the request carries an admin profiling token,
+    or the id of a query budget open in this process.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and _budgets:
+            captured = _budgets.get(_header(scope, b"x-query-budget") or "")
+            if captured is not None:
+                token = sql_capture.set(captured)
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    sql_capture.reset(token)
+                return
+
+        if scope["type"] != "http" or not settings.PROFILING_ENABLED or not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        report_id = uuid.uuid4().hex[:12]
+        status_holder = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = str(message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", report_id.encode())]
+            await send(message)
+
+        sql: List[Tuple[str, str, float]] = []
+        token = sql_capture.set(sql)
+        sampler = Sampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        sampler.start()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            wall = perf_counter() - start
+            sampler.stop()
+            sql_capture.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            store_report(report_id, build_report(scope["method"], path, status_holder[0], wall, sampler, sql))
+
+
+# ------------------------------------------------------------------------------
+# Query budgets (tests / CI)
+# ------------------------------------------------------------------------------
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.captured: List[Tuple[str, str, float]] = []
+        self.headers = {"X-Query-Budget": self.id}
+
+    @property
+    def statements(self) -> List[str]:
+        return [stmt for _db, stmt, _s in self.captured]
+
+
+@contextmanager
+def query_budget(max_queries: Optional[int] = None, max_ms: Optional[float] = None) -> Iterator[QueryBudget]:
+    """
+    Asserts the block runs at most ``max_queries`` SQL statements (on any
+    engine) and finishes within ``max_ms``. Counts statements run in the
+    calling context (through the ``sql_capture`` context variable, like
+    profiling) and in requests sent with ``budget.headers``.
+    """
+    budget = QueryBudget()
+    _budgets[budget.id] = budget.captured
+    token = sql_capture.set(budget.captured)
+    start = perf_counter()
+    try:
+        yield budget
+    finally:
+        elapsed_ms = (perf_counter() - start) * 1000
+        sql_capture.reset(token)
+        del _budgets[budget.id]
+
+    statements = budget.statements
+    problems = []
+    if max_queries is not None and len(statements) > max_queries:
+        problems.append(f"{len(statements)} SQL statements (budget {max_queries})")
+    if max_ms is not None and elapsed_ms > max_ms:
+        problems.append(f"{elapsed_ms:.1f} ms (budget {max_ms} ms)")
+    if problems:
+        listing = "\n".join(f"  {i + 1}. {s.strip()[:200]}" for i, s in enumerate(statements))
+        raise QueryBudgetExceeded(f"query budget exceeded: {', '.join(problems)}\n{listing}")
+
+
+def assert_endpoint_budgets(client, budgets: Dict[Tuple[str, str], Tuple[Optional[int], Optional[float]]], **kwargs) -> None:
+    """
+    Checks a table of ``{(method, path): (max_queries, max_ms)}`` against a
+    TestClient, e.g. one entry per list endpoint in app/routers/.
+    Extra keyword arguments (headers, ...) go to every request.
+    """
+    headers = kwargs.pop("headers", None) or {}
+    for (method, path), (max_queries, max_ms) in budgets.items():
+        try:
+            with query_budget(max_queries, max_ms) as budget:
+                response = client.request(method, path, headers={**headers, **budget.headers}, **kwargs)
+        except QueryBudgetExceeded as exc:
+            raise QueryBudgetExceeded(f"{method} {path}: {exc}") from None
+        # an error response would meet any budget without exercising the endpoint
+        if response.status_code >= 400:
+            raise AssertionError(f"{method} {path}: HTTP {response.status_code} {response.text[:200]}")
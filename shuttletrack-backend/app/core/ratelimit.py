@@ -0,0 +1,177 @@
+# app/core/ratelimit.py
+"""
+In-memory token-bucket rate limiting.
+
+Each policy keeps one bucket per key (bus id, user id or client IP) in an
+LRU-bounded OrderedDict, so a check is O(1) and memory is capped at
+``max_keys`` buckets per policy. Buckets refill lazily on access; nothing
+runs in the background.
+
+Limits are per process: with several workers each one enforces its own
+budget, which is fine for protecting CPU (bcrypt) and write volume.
+
+Client IPs come from the socket peer. ``X-Forwarded-For`` is only read when
+the peer is in TRUSTED_PROXIES, and then from the right: each trusted hop
+appends the address it saw, and everything to the left of that is supplied
+by the client and can be forged.
+"""
+import logging
+import math
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+logger = logging.getLogger("uvicorn.error")
+
+RATE_LIMITED = Counter(
+    "shuttletrack_rate_limited_total",
+    "Requests rejected by a rate-limit policy",
+    ("policy",),
+)
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = 10_000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        # sync dependencies run on threadpool threads
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, cost: float = 1.0) -> float:
+        """
+        Takes ``cost`` tokens from ``key``'s bucket. Returns 0 when allowed,
+        otherwise the number of seconds until enough tokens are available.
+        """
+        if not settings.RATE_LIMIT_ENABLED or self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = monotonic()
+            buckets = self._buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket(self.burst, now)
+                if len(buckets) > self.max_keys:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return 0.0
+            missing = cost - bucket.tokens
+        RATE_LIMITED.inc(self.name)
+        return missing / self.rate
+
+
+# ------------------------------------------------------------------------------
+# Key functions
+# ------------------------------------------------------------------------------
+def _trusted(ip: str) -> bool:
+    proxies = settings.TRUSTED_PROXIES
+    return "*" in proxies or ip in proxies
+
+
+_warned_untrusted: set = set()
+
+
+def _warn_untrusted(peer: str) -> None:
+    # once per peer: behind a proxy this fires on every request
+    if peer in _warned_untrusted or len(_warned_untrusted) >= 100:
+        return
+    _warned_untrusted.add(peer)
+    logger.warning(
+        "X-Forwarded-For from untrusted peer %s ignored; rate limits are keyed by that peer. "
+        "If the app runs behind a proxy, add it to TRUSTED_PROXIES.", peer,
+    )
+
+
+def client_ip(conn: HTTPConnection) -> str:
+    peer = conn.client.host if conn.client else "unknown"
+    forwarded = conn.headers.get("x-forwarded-for")
+    if not settings.TRUSTED_PROXIES or not _trusted(peer):
+        if forwarded:
+            _warn_untrusted(peer)
+        return peer
+    if not forwarded:
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    # right-most entry not added by one of our own proxies
+    for hop in reversed(hops):
+        if not _trusted(hop) or "*" in settings.TRUSTED_PROXIES:
+            return hop
+    return hops[0] if hops else peer
+
+
+def bus_id_key(conn: HTTPConnection) -> str:
+    return "bus:" + str(conn.path_params.get("bus_id"))
+
+
+def user_or_ip_key(conn: HTTPConnection) -> str:
+    auth = conn.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(auth[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            if payload.get("user_id") is not None:
+                return "user:" + str(payload["user_id"])
+        except JWTError:
+            pass
+    return "ip:" + client_ip(conn)
+
+
+# ------------------------------------------------------------------------------
+# Policies (configured in Settings)
+# ------------------------------------------------------------------------------
+ingest_limiter = RateLimiter(
+    "ingest", settings.RATE_LIMIT_INGEST_PER_SECOND, settings.RATE_LIMIT_INGEST_BURST
+)
+login_limiter = RateLimiter(
+    "login", settings.RATE_LIMIT_LOGIN_PER_SECOND, settings.RATE_LIMIT_LOGIN_BURST
+)
+ws_connect_limiter = RateLimiter(
+    "ws_connect", settings.RATE_LIMIT_WS_CONNECT_PER_SECOND, settings.RATE_LIMIT_WS_CONNECT_BURST
+)
+write_limiter = RateLimiter(
+    "write", settings.RATE_LIMIT_WRITE_PER_SECOND, settings.RATE_LIMIT_WRITE_BURST
+)
+
+
+def rate_limit(limiter: RateLimiter, key_func: Callable[[HTTPConnection], str]):
+    """FastAPI dependency factory: 429 with Retry-After when the bucket is empty."""
+
+    def dependency(request: Request) -> None:
+        retry_after = limiter.hit(key_func(request))
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
+
+
+def check_ws_connect(conn: HTTPConnection) -> Optional[float]:
+    """Per-IP reconnect throttle for WebSocket endpoints; returns retry-after or None."""
+    retry_after = ws_connect_limiter.hit(client_ip(conn))
+    return retry_after or None
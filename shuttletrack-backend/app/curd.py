@@ -2,6 +2,7 @@ from sqlmodel import select
 from sqlalchemy.orm import Session
 from app import models
 from app.core.security import get_password_hash
+from app.services.admin_summary import admin_summary
 
 def get_user_by_username(session: Session, username: str):
     return session.exec(select(models.User).where(models.User.username == username)).first()
@@ -12,4 +13,5 @@ def create_user(session: Session, username: str, password: str, role: str = "stu
     session.add(user)
     session.commit()
     session.refresh(user)
+    admin_summary.user_created(user.role)
     return user
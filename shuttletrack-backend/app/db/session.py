@@ -1,18 +1,137 @@
 # app/db/session.py
+"""
+Database engines and sessions.
+
+Two named engines, each with its own pool and connection PRAGMAs:
+
+- ``main``: users, routes, stops, buses, feedback, announcements, scheduler
+  lease. Low write rate, latency-sensitive (logins, admin edits).
+- ``telemetry``: high-rate ingest and the tables derived from it
+  (TELEMETRY_TABLES). Lives in TELEMETRY_DATABASE_URL so ingest write locks
+  never stall the main database; leave that setting empty to share one.
+
+``get_session`` binds telemetry models to the telemetry engine and
+everything else to main, so it is safe for any query (no cross-database
+joins, though). ``get_telemetry_session`` is pinned to telemetry for paths
+that only touch those tables.
+"""
+from time import perf_counter
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.profiling import sql_capture
+
+TELEMETRY_TABLES = ("buslocation", "segmentstat", "rollupstate")
+
+# ------------------------------------------------------------------------------
+# SQL instrumentation
+# ------------------------------------------------------------------------------
+SQL_STATEMENTS = Counter(
+    "shuttletrack_sql_statements_total",
+    "SQL statements executed, by database and verb",
+    ("db", "verb"),
+)
+SQL_DURATION = Histogram(
+    "shuttletrack_sql_statement_duration_seconds",
+    "SQL statement execution time, by database and verb",
+    ("db", "verb"),
+)
+
+
+def _instrument(engine: Engine, name: str) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start"].pop()
+        verb = (statement[:16].split(None, 1) or ["?"])[0].upper()
+        SQL_STATEMENTS.inc(name, verb)
+        SQL_DURATION.observe(elapsed, name, verb)
+        captured = sql_capture.get()
+        if captured is not None:  # request being profiled
+            captured.append((name, statement, elapsed))
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # after_cursor_execute never fires for a failed statement: drop its start
+        # time, or the stack on a pooled connection grows with every error
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def _sqlite_pragmas(engine: Engine) -> None:
+    # WAL lets readers run alongside the writer; NORMAL sync is durable at
+    # checkpoints and much cheaper per commit than FULL
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
 
-# SQLite note: check_same_thread for sqlite only
-connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(settings.DATABASE_URL, echo=False, connect_args=connect_args)
+
+def _make_engine(url: str, name: str) -> Engine:
+    # SQLite note: check_same_thread for sqlite only
+    sqlite = url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if sqlite else {}
+    engine = create_engine(url, echo=False, connect_args=connect_args)
+    if sqlite:
+        _sqlite_pragmas(engine)
+    _instrument(engine, name)
+    return engine
+
+
+engine = _make_engine(settings.DATABASE_URL, "main")
+if settings.TELEMETRY_DATABASE_URL and settings.TELEMETRY_DATABASE_URL != settings.DATABASE_URL:
+    telemetry_engine = _make_engine(settings.TELEMETRY_DATABASE_URL, "telemetry")
+else:
+    telemetry_engine = engine
+
+engines: Dict[str, Engine] = {"main": engine, "telemetry": telemetry_engine}
+
+_binds = None
+
+
+def _table_binds() -> dict:
+    global _binds
+    if _binds is None:
+        import app.models  # noqa: F401
+        _binds = {
+            table: telemetry_engine if name in TELEMETRY_TABLES else engine
+            for name, table in SQLModel.metadata.tables.items()
+        }
+    return _binds
+
+
+def open_session() -> Session:
+    """A session that routes each table to its engine."""
+    return Session(engine, binds=_table_binds())
 
 
 def init_db():
     # import models so SQLModel metadata is populated
     import app.models  # noqa: F401
-    SQLModel.metadata.create_all(engine)
+    tables = SQLModel.metadata.tables
+    if telemetry_engine is engine:
+        SQLModel.metadata.create_all(engine)
+        return
+    SQLModel.metadata.create_all(engine, tables=[t for n, t in tables.items() if n not in TELEMETRY_TABLES])
+    SQLModel.metadata.create_all(telemetry_engine, tables=[t for n, t in tables.items() if n in TELEMETRY_TABLES])
 
 
 def get_session():
-    with Session(engine) as session:
+    with open_session() as session:
+        yield session
+
+
+def get_telemetry_session():
+    with Session(telemetry_engine) as session:
         yield session
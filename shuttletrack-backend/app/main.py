@@ -1,14 +1,47 @@
 # app/main.py
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+
+# ------------------------------------------------------------------------------
+# Lifespan: seed, restore/warm live state, run the job scheduler
+# ------------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.seed import main as seed_main  # TEMP – hackathon safe
+    from app.services import fleet_state, geo_index, live_checkpoint
+    from app.services.jobs import register_jobs
+    from app.services.scheduler import scheduler
+
+    seed_main()
+    # checkpoint first (newest positions, history, seq); the DB fills the gaps
+    live_checkpoint.restore()
+    with Session(engine) as session:
+        geo_index.warm_from_db(session)
+        fleet_state.warm_from_db(session)
+
+    register_jobs(scheduler)
+    await scheduler.start()
+    try:
+        yield
+    finally:
+        await scheduler.stop()
+        live_checkpoint.checkpoint()
+
 # ------------------------------------------------------------------------------
 # App init
 # ------------------------------------------------------------------------------
 app = FastAPI(
     title="ShuttleTrack API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # ------------------------------------------------------------------------------
@@ -26,6 +59,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ------------------------------------------------------------------------------
+# Metrics (per-route latency histograms, exposed at /metrics)
+# ------------------------------------------------------------------------------
+app.add_middleware(MetricsMiddleware)
+
+# ------------------------------------------------------------------------------
+# On-demand profiling (admin token in X-Profile; reports at /admin/profiles)
+# ------------------------------------------------------------------------------
+app.add_middleware(ProfilingMiddleware)
+
 # ------------------------------------------------------------------------------
 # Root health check
 # ------------------------------------------------------------------------------
@@ -48,8 +91,12 @@ from app.routers.buses_router import router as buses_router
 from app.routers.feedback_router import router as feedback_router
 from app.routers.announcements_router import router as announcements_router
 from app.routers.websocket_router import router as websocket_router
+from app.routers.driver_ws_router import router as driver_ws_router
 from app.routers.locations import router as locations_router
 from app.routers.user_router import router as users_router
+from app.routers.metrics_router import router as metrics_router
+from app.routers.fleet_router import router as fleet_router
+from app.routers.admin_router import router as admin_router
 
 app.include_router(users_router)
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
@@ -58,13 +105,8 @@ app.include_router(buses_router)
 app.include_router(feedback_router, prefix="/feedback", tags=["Feedback"])
 app.include_router(announcements_router, prefix="/announcements", tags=["Announcements"])
 app.include_router(websocket_router)
+app.include_router(driver_ws_router)
 app.include_router(locations_router, prefix="/locations", tags=["Locations"])
-
-# ------------------------------------------------------------------------------
-# Seed data on startup (TEMP – hackathon safe)
-# ------------------------------------------------------------------------------
-from app.seed import main as seed_main
-
-@app.on_event("startup")
-def run_seed():
-    seed_main()
+app.include_router(metrics_router)
+app.include_router(fleet_router)
+app.include_router(admin_router)
@@ -2,7 +2,7 @@
 from typing import Optional, List, Dict
 from datetime import datetime
 from sqlmodel import SQLModel, Field, Relationship, Column
-from sqlalchemy import JSON
+from sqlalchemy import JSON, UniqueConstraint
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -64,6 +64,7 @@ class Announcement(SQLModel, table=True):
 # BusLocation appended at end (sa_column JSON WITHOUT nullable arg)
 class BusLocation(SQLModel, table=True):
     __tablename__ = "buslocation"
+    # client_seq is deduplicated in memory, not by a constraint: see app/services/ingest_sequence.py
 
     id: Optional[int] = Field(default=None, primary_key=True)
     bus_id: int = Field(index=True)
@@ -75,3 +76,37 @@ class BusLocation(SQLModel, table=True):
     eta: Optional[str] = Field(default=None)
     extra: Optional[Dict] = Field(default=None, sa_column=Column(JSON))
     timestamp: Optional[datetime] = Field(default=None)
+    client_seq: Optional[int] = Field(default=None)  # per-device sequence number, if sent
+
+
+# Single-leader lease for the in-app job scheduler (app/services/scheduler.py)
+class SchedulerLease(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    owner: str
+    expires_at: datetime
+
+
+# Stop-to-stop travel-time rollups (app/services/segment_rollup.py)
+class SegmentStat(SQLModel, table=True):
+    __tablename__ = "segmentstat"
+    __table_args__ = (UniqueConstraint("route_id", "from_stop", "to_stop", "bucket"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    route_id: int = Field(index=True)
+    from_stop: str
+    to_stop: str
+    bucket: int  # time-of-day bucket index (local time, SEGMENT_BUCKET_MINUTES wide)
+    count: int = Field(default=0)
+    mean_s: float = Field(default=0.0)
+    m2: float = Field(default=0.0)  # Welford sum of squared deviations
+    min_s: Optional[float] = Field(default=None)
+    max_s: Optional[float] = Field(default=None)
+    quantiles: Optional[Dict] = Field(default=None, sa_column=Column(JSON))  # P² marker state
+
+
+class RollupState(SQLModel, table=True):
+    __tablename__ = "rollupstate"
+
+    name: str = Field(primary_key=True)
+    watermark: int = Field(default=0)  # last processed BusLocation.id
+    state: Optional[Dict] = Field(default=None, sa_column=Column(JSON))
@@ -0,0 +1,109 @@
+# app/routers/admin_router.py
+import math
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlmodel import Session, select
+import jwt
+
+from app.core import profiling
+from app.core.config import settings
+from app.db.session import get_session, get_telemetry_session
+from app.models import SegmentStat
+from app.services.admin_summary import admin_summary
+from app.services.export import stream_locations
+from app.services.segment_rollup import quantile
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+security = HTTPBearer(auto_error=False)
+
+def decode_token(credentials: HTTPAuthorizationCredentials | None = Depends(security)):
+    if not credentials:
+        return {}
+    try:
+        return jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except Exception:
+        return {}
+
+def require_admin(token: dict = Depends(decode_token)):
+    if token.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return token
+
+@router.get("/summary")
+def dashboard_summary(session: Session = Depends(get_session), _: dict = Depends(require_admin)):
+    """Bus, user, feedback and ingest overview from incrementally maintained counters."""
+    if not admin_summary.reconciled:
+        admin_summary.reconcile(session)
+    return admin_summary.snapshot()
+
+@router.get("/segments")
+def segment_stats(
+    route_id: Optional[int] = None,
+    bucket: Optional[int] = None,
+    session: Session = Depends(get_telemetry_session),
+    _: dict = Depends(require_admin),
+):
+    """Stop-to-stop travel-time stats per time-of-day bucket (local time)."""
+    stmt = select(SegmentStat)
+    if route_id is not None:
+        stmt = stmt.where(SegmentStat.route_id == route_id)
+    if bucket is not None:
+        stmt = stmt.where(SegmentStat.bucket == bucket)
+    stmt = stmt.order_by(SegmentStat.route_id, SegmentStat.from_stop, SegmentStat.to_stop, SegmentStat.bucket)
+
+    width = settings.SEGMENT_BUCKET_MINUTES
+    out = []
+    for stat in session.exec(stmt):
+        start = stat.bucket * width
+        out.append({
+            "route_id": stat.route_id,
+            "from_stop": stat.from_stop,
+            "to_stop": stat.to_stop,
+            "bucket": stat.bucket,
+            "bucket_start": f"{start // 60:02d}:{start % 60:02d}",
+            "count": stat.count,
+            "mean_s": round(stat.mean_s, 1),
+            "stddev_s": round(math.sqrt(stat.m2 / (stat.count - 1)), 1) if stat.count > 1 else None,
+            "min_s": stat.min_s,
+            "max_s": stat.max_s,
+            "p50_s": quantile(stat, 0.5),
+            "p90_s": quantile(stat, 0.9),
+        })
+    return out
+
+@router.get("/profiles")
+def list_profiles(_: dict = Depends(require_admin)):
+    """Stored request profiles, newest first."""
+    return profiling.list_reports()
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, _: dict = Depends(require_admin)):
+    report = profiling.get_report(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
+
+@router.get("/export/locations")
+def export_locations(
+    bus_id: Optional[int] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    _: dict = Depends(require_admin),
+):
+    """Streams BusLocation history; memory use is flat regardless of row count."""
+    filename = f"locations{'-bus' + str(bus_id) if bus_id is not None else ''}.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream_locations(format, bus_id, start, end, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
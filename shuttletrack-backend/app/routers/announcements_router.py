@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 from app import models
 from app.db.session import get_session
@@ -6,6 +6,10 @@ from app.schemas import AnnouncementCreate
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from app.core.config import settings
+from app.core import fastjson
+from app.core.ratelimit import rate_limit, user_or_ip_key, write_limiter
+from app.services import fast_reads, read_cache
+from app.services.admin_summary import admin_summary
 
 router = APIRouter(prefix="/announcements", tags=["announcements"])
 security = HTTPBearer(auto_error=False)
@@ -19,15 +23,20 @@ def decode_token(credentials: HTTPAuthorizationCredentials | None = Depends(secu
         return {}
 
 @router.get("")
-def list_announcements(session: Session = Depends(get_session)):
+def list_announcements(request: Request, fast: bool = settings.FAST_READ_PATH, session: Session = Depends(get_session)):
+    if fast:
+        body, variants = read_cache.get_or_build("announcements", lambda: fast_reads.announcement_rows(session))
+        return fastjson.json_bytes_response(request, body, variants)
     return session.exec(select(models.Announcement).order_by(models.Announcement.created_at.desc())).all()
 
-@router.post("", status_code=201)
+@router.post("", status_code=201, dependencies=[Depends(rate_limit(write_limiter, user_or_ip_key))])
 def post_announcement(data: AnnouncementCreate, session: Session = Depends(get_session), token: dict = Depends(decode_token)):
     if token.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
     ann = models.Announcement(message=data.message)
     session.add(ann)
     session.commit()
+    read_cache.bump("announcements")
     session.refresh(ann)
+    admin_summary.announcement_posted(ann)
     return ann
@@ -7,11 +7,11 @@ from app.db.session import get_session
 from app.schemas import Token, AuthRequest
 from app.services.user_service import get_user_by_username
 from app.core.security import verify_password, create_access_token
+from app.core.ratelimit import client_ip, login_limiter, rate_limit
 
 router = APIRouter(tags=["Auth"])
 
-@router.post("/login", response_model=Token)
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit(login_limiter, client_ip))])
 def login(payload: AuthRequest, session: Session = Depends(get_session)):
     user = get_user_by_username(session, payload.username)
 
@@ -1,16 +1,21 @@
 # app/routers/buses_router.py
 # (Use the full content you already have but ensure the update_location matches the version below.)
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 from datetime import datetime
 from app.db.session import get_session
-from app.models import Bus as BusModel
+from app.models import Bus as BusModel, Route as RouteModel
 from app.schemas import BusRead, LocationPayload
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from app.core.config import settings
+from app.core import fastjson
 from app.routers.websocket_router import manager
+from app.services import fast_reads, read_cache
+from app.services.fleet_state import fleet_state
+from app.services.geo_index import geo_index
 import asyncio
 import logging
 
@@ -29,10 +34,30 @@ def decode_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(s
         return {}
 
 @router.get("", response_model=List[BusRead])
-def list_buses(session: Session = Depends(get_session)):
-    buses = session.exec(select(BusModel)).all()
+def list_buses(request: Request, fast: bool = settings.FAST_READ_PATH, session: Session = Depends(get_session)):
+    if fast:
+        body, variants = read_cache.get_or_build("buses", lambda: fast_reads.bus_rows(session))
+        return fastjson.json_bytes_response(request, body, variants)
+    # eager-load route + stops: serialising BusRead lazily loaded them per bus
+    buses = session.exec(
+        select(BusModel).options(selectinload(BusModel.route).selectinload(RouteModel.stops))
+    ).all()
     return buses
 
+@router.get("/nearby")
+async def nearby_buses(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, le=50_000, description="meters"),
+    limit: int = Query(10, ge=1, le=100),
+    max_age: Optional[float] = Query(None, gt=0, description="ignore fixes older than this many seconds"),
+):
+    """
+    Nearest-first live buses within ``radius`` meters, served from the in-memory
+    index. Async so the index is read on the event loop, where ingest mutates it.
+    """
+    return geo_index.nearby(lat, lon, radius, limit=limit, max_age_s=max_age)
+
 @router.get("/{bus_id}", response_model=BusRead)
 def get_bus(bus_id: int, session: Session = Depends(get_session)):
     bus = session.get(BusModel, bus_id)
@@ -42,6 +67,15 @@ def get_bus(bus_id: int, session: Session = Depends(get_session)):
 
 @router.get("/{bus_id}/location")
 def get_bus_location(bus_id: int, session: Session = Depends(get_session)):
+    # live state first: the Bus row is only written back every few seconds
+    live = fleet_state.get(bus_id)
+    if live is not None and live.lat is not None:
+        return {
+            "bus_id": bus_id,
+            "lat": live.lat,
+            "lon": live.lon,
+            "last_seen": live.ts.isoformat() if live.ts else None,
+        }
     bus = session.get(BusModel, bus_id)
     if not bus:
         raise HTTPException(status_code=404, detail="Bus not found")
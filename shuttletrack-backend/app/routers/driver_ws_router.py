@@ -0,0 +1,241 @@
+# app/routers/driver_ws_router.py
+"""
+Persistent driver channel: ``/ws/driver/{bus_id}?token=<JWT>``.
+
+The driver authenticates once on connect (role ``driver`` and owner of the
+bus), then streams fixes. Each frame may carry one fix or a batch:
+
+- JSON object:  {"seq": 17, "lat": 17.72, "lon": 83.30, "ts": 1718000000000,
+                 "acc": 8.0, "spd": 9.5, "hdg": 270}
+  (``latitude``/``longitude``/``timestamp``/``accuracy``/``speed``/``heading``
+  long names are accepted too; ``ts`` is epoch ms or an ISO string)
+- JSON array:   [seq, lat, lon, ts_ms, acc, spd, hdg] or a list of those
+- binary:       one or more little-endian 40-byte records
+                ``<I d d Q f f f`` = seq, lat, lon, ts_ms, acc, spd, hdg
+                (ts_ms 0 = server time, NaN = field missing)
+
+The server replies with
+``{"type": "ack", "seq": <highest held seq>, "seqs": [...], "count": n}``
+every DRIVER_WS_ACK_EVERY fixes or DRIVER_WS_ACK_INTERVAL_SECONDS, whichever
+comes first. ``seqs`` lists exactly the fixes the server now holds (stored,
+or already stored before), and clients should drop only those. Fixes that
+were rate limited, filtered or failed to store are not in it and can be resent.
+A frame may mix held and unheld fixes, so ``seq`` is not a cumulative ack.
+Fixes with impossible coordinates (NaN, out of range) are answered with an
+``error`` frame listing their seqs, and never stored.
+
+Fixes go through the same sequence/filter/store/broadcast path as
+``POST /buses/{bus_id}/location``, so frames resent after a reconnect are
+deduplicated by ``seq``.
+"""
+import asyncio
+import json
+import logging
+import math
+import struct
+from time import monotonic
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwt
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.core.ratelimit import check_ws_connect, ingest_limiter
+from app.db.session import engine, telemetry_engine
+from app.models import Bus
+from app.services.ingest import Fix, ingest_fixes, parse_timestamp
+from app.services.ingest_filter import valid_position
+
+router = APIRouter()
+logger = logging.getLogger("uvicorn.error")
+
+BINARY_RECORD = struct.Struct("<IddQfff")
+MAX_SEQ = 2 ** 63 - 1  # stored in a signed 64-bit column
+
+DRIVER_WS_FIXES = Counter(
+    "shuttletrack_driver_ws_fixes_total",
+    "Fixes received over the driver WebSocket channel, by outcome",
+    ("outcome",),
+)
+
+
+def _opt(value):
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _seq(value):
+    """Finite, non-negative integer (``17`` or ``17.0``) or None; anything else is malformed."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("seq must be an integer")
+    if isinstance(value, float) and not (math.isfinite(value) and value.is_integer()):
+        raise ValueError("seq must be an integer")
+    value = int(value)
+    if not 0 <= value <= MAX_SEQ:
+        raise ValueError("seq out of range")
+    return value
+
+
+def _fix_from_obj(obj) -> Fix:
+    if isinstance(obj, list):
+        seq, lat, lon, ts, *rest = obj + [None] * max(0, 7 - len(obj))
+        acc, spd, hdg = rest[:3]
+        return Fix(float(lat), float(lon), parse_timestamp(ts), _opt(acc), _opt(spd), _opt(hdg), seq=_seq(seq))
+    lat = obj.get("lat", obj.get("latitude"))
+    lon = obj.get("lon", obj.get("longitude"))
+    return Fix(
+        latitude=float(lat),
+        longitude=float(lon),
+        timestamp=parse_timestamp(obj.get("ts", obj.get("timestamp"))),
+        accuracy=_opt(obj.get("acc", obj.get("accuracy"))),
+        speed=_opt(obj.get("spd", obj.get("speed"))),
+        heading=_opt(obj.get("hdg", obj.get("heading"))),
+        current_stop=obj.get("current_stop"),
+        next_stop=obj.get("next_stop"),
+        eta=obj.get("eta"),
+        seq=_seq(obj.get("seq")),
+    )
+
+
+def _decode(message: dict) -> List[Fix]:
+    data = message.get("bytes")
+    if data is not None:
+        if not data or len(data) % BINARY_RECORD.size:
+            raise ValueError(f"binary frames must be a multiple of {BINARY_RECORD.size} bytes")
+        fixes = []
+        for seq, lat, lon, ts_ms, acc, spd, hdg in BINARY_RECORD.iter_unpack(data):
+            fixes.append(Fix(lat, lon, parse_timestamp(ts_ms), _opt(acc), _opt(spd), _opt(hdg), seq=seq))
+        return fixes
+
+    try:
+        obj = json.loads(message.get("text") or "")
+        if isinstance(obj, list) and obj and isinstance(obj[0], (list, dict)):
+            return [_fix_from_obj(item) for item in obj]
+        return [_fix_from_obj(obj)]
+    except (TypeError, KeyError, AttributeError, OverflowError, json.JSONDecodeError) as exc:
+        raise ValueError(f"malformed fix frame: {exc}") from exc
+
+
+def decode_frame(message: dict) -> Tuple[List[Fix], List[Optional[int]]]:
+    """
+    Returns the decodable fixes and the seqs of those with impossible
+    coordinates (skipped, so one bad fix doesn't sink its batch). Raises
+    ValueError for frames that can't be decoded at all.
+    """
+    fixes, rejected = [], []
+    for fix in _decode(message):
+        if valid_position(fix.latitude, fix.longitude):
+            fixes.append(fix)
+        else:
+            rejected.append(fix.seq)
+    return fixes, rejected
+
+
+def _authorize(token: str, bus_id: int) -> bool:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return False
+    if payload.get("role") != "driver" or payload.get("user_id") is None:
+        return False
+    with Session(engine) as session:
+        bus = session.get(Bus, bus_id)
+        return bus is not None and bus.driver_id == payload["user_id"]
+
+
+@router.websocket("/ws/driver/{bus_id}")
+async def websocket_driver_ingest(websocket: WebSocket, bus_id: int):
+    if check_ws_connect(websocket):
+        await websocket.close(code=1013)
+        return
+
+    token = websocket.query_params.get("token")
+    if not token or not await run_in_threadpool(_authorize, token, bus_id):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    logger.info("Driver WS connected → bus %s", bus_id)
+
+    rate_key = f"bus:{bus_id}"
+    ack_every = settings.DRIVER_WS_ACK_EVERY
+    ack_interval = settings.DRIVER_WS_ACK_INTERVAL_SECONDS
+    pending = 0
+    high_seq = None
+    held: List[int] = []  # seqs held since the last ack
+    last_ack = monotonic()
+
+    async def send_ack():
+        nonlocal pending, last_ack
+        await websocket.send_text(json.dumps({"type": "ack", "seq": high_seq, "seqs": held, "count": pending}))
+        held.clear()
+        pending = 0
+        last_ack = monotonic()
+
+    try:
+        while True:
+            timeout = max(0.05, ack_interval - (monotonic() - last_ack)) if pending else None
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout)
+            except asyncio.TimeoutError:
+                await send_ack()
+                continue
+            if message["type"] == "websocket.disconnect":
+                break
+
+            try:
+                fixes, rejected = decode_frame(message)
+            except ValueError as exc:
+                DRIVER_WS_FIXES.inc("malformed")
+                await websocket.send_text(json.dumps({"type": "error", "detail": str(exc)}))
+                continue
+            if rejected:
+                DRIVER_WS_FIXES.inc("invalid_position", amount=len(rejected))
+                await websocket.send_text(json.dumps(
+                    {"type": "error", "detail": "invalid coordinates", "seqs": rejected}
+                ))
+
+            allowed = []
+            for fix in fixes:
+                if ingest_limiter.hit(rate_key):
+                    DRIVER_WS_FIXES.inc("rate_limited")
+                else:
+                    allowed.append(fix)
+
+            results = []
+            if allowed:
+                try:
+                    with Session(telemetry_engine) as session:
+                        results = await ingest_fixes(session, bus_id, allowed)
+                except Exception:
+                    # keep the channel: the batch is simply not acked, and the client resends it
+                    logger.exception("Driver WS store failed bus=%s (%d fixes)", bus_id, len(allowed))
+                    DRIVER_WS_FIXES.inc("store_failed", amount=len(allowed))
+                    await websocket.send_text(json.dumps({"type": "error", "detail": "store failed, resend"}))
+            for fix, (loc, reason) in zip(allowed, results):
+                if reason in ("late", "duplicate_seq"):
+                    DRIVER_WS_FIXES.inc(reason)
+                else:
+                    DRIVER_WS_FIXES.inc("stored" if loc is not None else "filtered")
+                # acks list exactly the fixes the server holds; the others stay unacked on the client
+                if (loc is not None or reason == "duplicate_seq") and fix.seq is not None:
+                    held.append(fix.seq)
+                    if high_seq is None or fix.seq > high_seq:
+                        high_seq = fix.seq
+
+            pending += len(fixes) + len(rejected)
+            if pending >= ack_every or monotonic() - last_ack >= ack_interval:
+                await send_ack()
+    except WebSocketDisconnect:
+        pass
+    except Exception as exc:
+        logger.exception("Driver WS error bus=%s: %s", bus_id, exc)
+    finally:
+        logger.info("Driver WS disconnected → bus %s", bus_id)
@@ -6,6 +6,8 @@ from app.schemas import FeedbackCreate
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from app.core.config import settings
+from app.core.ratelimit import rate_limit, user_or_ip_key, write_limiter
+from app.services.admin_summary import admin_summary
 
 router = APIRouter(tags=["feedback"])
 security = HTTPBearer(auto_error=False)
@@ -18,7 +20,7 @@ def decode_token(credentials: HTTPAuthorizationCredentials | None = Depends(secu
     except Exception:
         return {}
 
-@router.post("", status_code=201)
+@router.post("", status_code=201, dependencies=[Depends(rate_limit(write_limiter, user_or_ip_key))])
 def submit_feedback(data: FeedbackCreate, session: Session = Depends(get_session), token: dict = Depends(decode_token)):
     user_id = token.get("user_id")
     role = token.get("role")
@@ -28,6 +30,7 @@ def submit_feedback(data: FeedbackCreate, session: Session = Depends(get_session
     session.add(fb)
     session.commit()
     session.refresh(fb)
+    admin_summary.feedback_created(fb.status)
     return fb
 
 @router.get("")
@@ -37,15 +40,17 @@ def list_feedback(session: Session = Depends(get_session), token: dict = Depends
     items = session.exec(select(models.Feedback)).all()
     return items
 
-@router.put("/{id}/status")
+@router.put("/{id}/status", dependencies=[Depends(rate_limit(write_limiter, user_or_ip_key))])
 def update_status(id: int, payload: dict, session: Session = Depends(get_session), token: dict = Depends(decode_token)):
     if token.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
     fb = session.get(models.Feedback, id)
     if not fb:
         raise HTTPException(status_code=404, detail="Not found")
+    old_status = fb.status
     fb.status = payload.get("status", fb.status)
     session.add(fb)
     session.commit()
     session.refresh(fb)
+    admin_summary.feedback_status_changed(old_status, fb.status)
     return fb
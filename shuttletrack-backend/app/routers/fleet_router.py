@@ -0,0 +1,22 @@
+# app/routers/fleet_router.py
+from typing import Optional
+
+from fastapi import APIRouter, Query, Response
+
+from app.core import fastjson
+from app.services.fleet_state import fleet_state
+
+router = APIRouter(prefix="/fleet", tags=["fleet"])
+
+
+@router.get("/snapshot")
+async def fleet_snapshot(since: Optional[str] = Query(None, max_length=64, description="version from a previous snapshot")):
+    """
+    Latest position of every active bus in one columnar response (parallel
+    arrays). Pass the returned ``version`` token back as ``since`` to get only
+    the buses that changed; ``full`` tells the client which kind it received
+    (always full after a restart or when another worker answers).
+    Served from memory; no BusLocation queries. Runs on the event loop,
+    like every other fleet_state writer, so the snapshot never races an update.
+    """
+    return Response(content=fastjson.dumps(fleet_state.snapshot(since)), media_type="application/json")
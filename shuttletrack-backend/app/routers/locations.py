@@ -1,21 +1,34 @@
 # app/routers/locations.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+import math
+
+from pydantic import BaseModel, BeforeValidator, Field
+from typing import Annotated, Optional
 from sqlmodel import Session, select
 
-from app.db.session import get_session
-from app.models import Bus, BusLocation
-from app.routers.websocket_router import manager  # ✅ ADD THIS
+from app.core.ratelimit import bus_id_key, ingest_limiter, rate_limit
+from app.db.session import get_session, get_telemetry_session
+from app.models import Bus
+from app.services.ingest import Fix, ingest_fixes, parse_timestamp
+from app.services.ingest_filter import fix_filter
 
 router = APIRouter(prefix="/buses", tags=["buses"])
 
 
+def _finite(value):
+    # NaN/inf -> None, so the 422 reports a missing number; echoing NaN back
+    # would make the error response itself unserialisable
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+Coordinate = Annotated[float, BeforeValidator(_finite)]
+
+
 class LocationIn(BaseModel):
-    latitude: float
-    longitude: float
+    latitude: Coordinate = Field(..., ge=-90, le=90)
+    longitude: Coordinate = Field(..., ge=-180, le=180)
     accuracy: Optional[float] = None
     heading: Optional[float] = None
     speed: Optional[float] = None
@@ -25,57 +38,52 @@ class LocationIn(BaseModel):
     eta: Optional[str] = None
     is_active: Optional[bool] = True
     extra: Optional[dict] = None
+    seq: Optional[int] = Field(None, ge=0)  # per-device sequence number; makes retries idempotent
 
 
-@router.post("/{bus_id}/location", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/{bus_id}/location",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit(ingest_limiter, bus_id_key))],
+)
 async def post_bus_location(
     bus_id: int,
     payload: LocationIn,
-    session: Session = Depends(get_session),
+    response: Response,
+    session: Session = Depends(get_telemetry_session),
+    main_session: Session = Depends(get_session),
 ):
     try:
-        # ✅ verify bus exists
-        bus = session.get(Bus, bus_id)
-        if not bus:
-            raise HTTPException(status_code=404, detail="Bus not found")
-
-        # ---- timestamp handling ----
-        if payload.timestamp:
-            try:
-                ts = datetime.fromisoformat(payload.timestamp)
-            except Exception:
-                ts = datetime.utcnow()
-        else:
-            ts = datetime.utcnow()
-
-        # ---- store location ----
-        loc = BusLocation(
-            bus_id=bus_id,
+        # ✅ verify bus exists (re-checked every INGEST_BUS_RECHECK_SECONDS)
+        if not fix_filter.known(bus_id):
+            bus = await run_in_threadpool(main_session.get, Bus, bus_id)
+            if not bus:
+                raise HTTPException(status_code=404, detail="Bus not found")
+            fix_filter.mark_verified(bus_id)
+
+        fix = Fix(
             latitude=payload.latitude,
             longitude=payload.longitude,
-            is_active=payload.is_active if payload.is_active is not None else True,
+            timestamp=parse_timestamp(payload.timestamp),
+            accuracy=payload.accuracy,
+            speed=payload.speed,
+            heading=payload.heading,
             current_stop=payload.current_stop,
             next_stop=payload.next_stop,
             eta=payload.eta,
+            is_active=payload.is_active if payload.is_active is not None else True,
             extra=payload.extra,
-            timestamp=ts,
+            seq=payload.seq,
         )
 
-        session.add(loc)
-        session.commit()
-        session.refresh(loc)
-
-        # ---- broadcast to subscribers ----
-        await manager.broadcast_to_bus(
-            str(bus_id),
-            {
-                "type": "location_update",
-                "bus_id": bus_id,
-                "latitude": payload.latitude,
-                "longitude": payload.longitude,
-                "timestamp": ts.isoformat(),
-            },
-        )
+        # ---- filter, store and broadcast (shared with the driver WS channel) ----
+        [(loc, reason)] = await ingest_fixes(session, bus_id, [fix])
+        if reason == "duplicate_seq":
+            response.status_code = status.HTTP_200_OK
+            return {"detail": "duplicate"}
+        if loc is None:
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {"detail": "filtered", "reason": reason}
 
         return {"detail": "ok", "id": loc.id}
 
@@ -0,0 +1,12 @@
+# app/routers/metrics_router.py
+from fastapi import APIRouter, Response
+
+from app.core import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of the in-process metrics registry."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
 from sqlmodel import Session, select
 from app.db.session import get_session
@@ -7,6 +7,9 @@ from app.schemas import RouteCreate
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
 from app.core.config import settings
+from app.core import fastjson
+from app.core.ratelimit import rate_limit, user_or_ip_key, write_limiter
+from app.services import fast_reads, read_cache, route_geometry
 
 router = APIRouter(prefix="/routes", tags=["routes"])
 security = HTTPBearer(auto_error=False)
@@ -21,10 +24,13 @@ def get_current_role(credentials: HTTPAuthorizationCredentials | None = Depends(
         return None
 
 @router.get("", response_model=List[models.Route])
-def list_routes(session: Session = Depends(get_session)):
+def list_routes(request: Request, fast: bool = settings.FAST_READ_PATH, session: Session = Depends(get_session)):
+    if fast:
+        body, variants = read_cache.get_or_build("routes", lambda: fast_reads.route_rows(session))
+        return fastjson.json_bytes_response(request, body, variants)
     return session.exec(select(models.Route)).all()
 
-@router.post("", response_model=models.Route)
+@router.post("", response_model=models.Route, dependencies=[Depends(rate_limit(write_limiter, user_or_ip_key))])
 def create_route(body: RouteCreate, session: Session = Depends(get_session), role: str = Depends(get_current_role)):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
@@ -36,6 +42,8 @@ def create_route(body: RouteCreate, session: Session = Depends(get_session), rol
         stop = models.Stop(route_id=route.id, name=s.name, latitude=s.latitude, longitude=s.longitude, order=s.order)
         session.add(stop)
     session.commit()
+    read_cache.bump("routes", "buses")
+    route_geometry.recompute(session, route.id)
     session.refresh(route)
     return route
 
@@ -46,7 +54,19 @@ def get_route(id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Not found")
     return route
 
-@router.put("/{id}", response_model=models.Route)
+@router.get("/{id}/geometry")
+def get_route_geometry(id: int, request: Request, session: Session = Depends(get_session)):
+    """Ordered stops, encoded polyline, cumulative distances and bbox; supports If-None-Match."""
+    geometry = route_geometry.get(session, id)
+    if geometry is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    if geometry.matches(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers={"ETag": geometry.etag, "Vary": "Accept-Encoding"})
+    response = fastjson.json_bytes_response(request, geometry.body, geometry.variants)
+    response.headers["ETag"] = geometry.etag
+    return response
+
+@router.put("/{id}", response_model=models.Route, dependencies=[Depends(rate_limit(write_limiter, user_or_ip_key))])
 def update_route(id: int, body: RouteCreate, session: Session = Depends(get_session), role: str = Depends(get_current_role)):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
@@ -61,16 +81,21 @@ def update_route(id: int, body: RouteCreate, session: Session = Depends(get_sess
         session.add(stop)
     session.add(route)
     session.commit()
+    read_cache.bump("routes", "buses")
+    route_geometry.recompute(session, route.id)
     session.refresh(route)
     return route
 
-@router.delete("/{id}", status_code=204)
+@router.delete("/{id}", status_code=204, dependencies=[Depends(rate_limit(write_limiter, user_or_ip_key))])
 def delete_route(id: int, session: Session = Depends(get_session), role: str = Depends(get_current_role)):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
     route = session.get(models.Route, id)
     if not route:
         raise HTTPException(status_code=404, detail="Not found")
+    session.query(models.Stop).filter(models.Stop.route_id == route.id).delete()
     session.delete(route)
     session.commit()
+    read_cache.bump("routes", "buses")
+    route_geometry.discard(id)
     return {}
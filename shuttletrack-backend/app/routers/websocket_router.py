@@ -6,21 +6,40 @@ import logging
 
 from jose import jwt, JWTError
 from app.core.config import settings
+from app.core.metrics import CallbackGauge, Counter, Histogram
+from app.core.ratelimit import check_ws_connect
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn.error")
 
+WS_REJECTED = Counter(
+    "shuttletrack_ws_rejected_connects_total",
+    "WebSocket subscribe attempts rejected, by reason",
+    ("reason",),
+)
+WS_BROADCAST_DURATION = Histogram(
+    "shuttletrack_ws_broadcast_duration_seconds",
+    "Time to fan one update out to every subscriber of a bus",
+)
+WS_BROADCAST_FAILURES = Counter(
+    "shuttletrack_ws_broadcast_failures_total",
+    "Sends that failed during broadcast (subscriber dropped)",
+)
+
 
 class ConnectionManager:
     """
     Manages WebSocket connections per bus.
     Render free tier friendly:
     - Authenticated connections only
-    - Limited subscribers per bus
+    - Global socket capacity (WS_MAX_CONNECTIONS) instead of a per-bus cap,
+      so one popular bus can use headroom other buses aren't using
     """
 
-    def __init__(self):
+    def __init__(self, max_connections: int = settings.WS_MAX_CONNECTIONS):
         self.bus_subscribers: Dict[str, Set[WebSocket]] = {}
+        self.max_connections = max_connections
+        self._total = 0
 
     async def _safe_send(self, websocket: WebSocket, payload: str):
         try:
@@ -28,23 +47,26 @@ class ConnectionManager:
         except Exception:
             raise
 
-    async def connect_bus(self, websocket: WebSocket, bus_id: str):
-        subs = self.bus_subscribers.setdefault(bus_id, set())
-
-        # 🚨 HARD LIMIT (Render free tier protection)
-        if len(subs) >= 5:
+    async def connect_bus(self, websocket: WebSocket, bus_id: str) -> bool:
+        # 🚨 GLOBAL CAPACITY (Render free tier protection)
+        if self._total >= self.max_connections:
+            WS_REJECTED.inc("capacity")
             await websocket.close(code=1013)
-            return
+            return False
 
         await websocket.accept()
+        subs = self.bus_subscribers.setdefault(bus_id, set())
         subs.add(websocket)
-        logger.info("WS connected → bus %s | subs=%d", bus_id, len(subs))
+        self._total += 1
+        logger.info("WS connected → bus %s | subs=%d total=%d", bus_id, len(subs), self._total)
+        return True
 
     def disconnect_bus(self, websocket: WebSocket, bus_id: str):
         subs = self.bus_subscribers.get(bus_id)
-        if not subs:
+        if not subs or websocket not in subs:
             return
         subs.discard(websocket)
+        self._total -= 1
         if not subs:
             self.bus_subscribers.pop(bus_id, None)
         logger.info("WS disconnected → bus %s", bus_id)
@@ -54,24 +76,45 @@ class ConnectionManager:
         if not subs:
             return
 
-        payload = json.dumps(message)
-        coros = []
+        with WS_BROADCAST_DURATION.time():
+            payload = json.dumps(message)
+            coros = []
 
-        for ws in subs:
-            coros.append(self._safe_send(ws, payload))
+            for ws in subs:
+                coros.append(self._safe_send(ws, payload))
 
-        results = await asyncio.gather(*coros, return_exceptions=True)
+            results = await asyncio.gather(*coros, return_exceptions=True)
 
         for idx, res in enumerate(results):
             if isinstance(res, Exception):
+                WS_BROADCAST_FAILURES.inc()
                 try:
                     self.disconnect_bus(subs[idx], bus_id)
                 except Exception:
                     pass
 
 
+    def subscriber_counts(self) -> Dict[tuple, int]:
+        return {(bus_id,): len(subs) for bus_id, subs in list(self.bus_subscribers.items())}
+
+    def total_sockets(self) -> int:
+        return self._total
+
+
 manager = ConnectionManager()
 
+CallbackGauge(
+    "shuttletrack_ws_subscribers",
+    "Open subscriber sockets per bus",
+    manager.subscriber_counts,
+    ("bus_id",),
+)
+CallbackGauge(
+    "shuttletrack_ws_sockets",
+    "Open subscriber sockets across all buses",
+    manager.total_sockets,
+)
+
 
 @router.websocket("/ws/subscribe/{bus_id}")
 async def websocket_subscribe_bus(websocket: WebSocket, bus_id: str):
@@ -80,9 +123,15 @@ async def websocket_subscribe_bus(websocket: WebSocket, bus_id: str):
     JWT token is REQUIRED via query param.
     """
 
+    if check_ws_connect(websocket):
+        WS_REJECTED.inc("rate_limited")
+        await websocket.close(code=1013)
+        return
+
     token = websocket.query_params.get("token")
 
     if not token:
+        WS_REJECTED.inc("no_token")
         await websocket.close(code=1008)
         return
 
@@ -96,14 +145,17 @@ async def websocket_subscribe_bus(websocket: WebSocket, bus_id: str):
 
         # 🔐 Allow only valid viewers
         if role not in ("student", "admin"):
+            WS_REJECTED.inc("forbidden_role")
             await websocket.close(code=1008)
             return
 
     except JWTError:
+        WS_REJECTED.inc("bad_token")
         await websocket.close(code=1008)
         return
 
-    await manager.connect_bus(websocket, str(bus_id))
+    if not await manager.connect_bus(websocket, str(bus_id)):
+        return
 
     try:
         while True:
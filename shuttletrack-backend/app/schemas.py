@@ -43,9 +43,15 @@ class RouteRead(BaseModel):
     class Config:
         from_attributes = True
 
+class StopCreate(BaseModel):
+    name: str
+    latitude: float = 0.0
+    longitude: float = 0.0
+    order: int = 0
+
 class RouteCreate(BaseModel):
     name: str
-    stops: Optional[List[Dict[str, Any]]] = []
+    stops: Optional[List[StopCreate]] = []
 
 # Bus
 class BusRead(BaseModel):
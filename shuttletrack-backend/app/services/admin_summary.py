@@ -0,0 +1,106 @@
+# app/services/admin_summary.py
+"""
+Counters behind ``GET /admin/summary``.
+
+Write paths update them incrementally, right after their own commit:
+feedback submitted or re-statused, announcement posted, user created,
+location fixes stored. Reading the summary is then a handful of dict
+lookups instead of four full-table dumps. Bus activity comes straight from
+live fleet state.
+
+Counters are per process, and a write handled by another worker isn't seen
+here. The ``summary_reconcile`` job therefore recounts from the DB
+periodically (GROUP BY queries, off the event loop). The first read
+reconciles synchronously.
+"""
+from collections import Counter as Tally
+from time import monotonic
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app import models
+from app.services.fleet_state import fleet_state
+
+RATE_WINDOW_SECONDS = 60
+
+
+class AdminSummary:
+    def __init__(self):
+        self.reconciled = False
+        self.bus_total = 0
+        self.users_by_role: Tally = Tally()
+        self.feedback_by_status: Tally = Tally()
+        self.latest_announcement: Optional[dict] = None
+        # stored fixes per second over the last minute (ring indexed by second)
+        self._ingest = [0] * RATE_WINDOW_SECONDS
+        self._ingest_second = [0] * RATE_WINDOW_SECONDS
+
+    # --------------------------------------------------------------------------
+    # Write-path hooks
+    # --------------------------------------------------------------------------
+    def user_created(self, role: str) -> None:
+        self.users_by_role[role] += 1
+
+    def feedback_created(self, status: str) -> None:
+        self.feedback_by_status[status] += 1
+
+    def feedback_status_changed(self, old: str, new: str) -> None:
+        if old == new:
+            return
+        self.feedback_by_status[old] -= 1
+        self.feedback_by_status[new] += 1
+
+    def announcement_posted(self, ann: models.Announcement) -> None:
+        self.latest_announcement = {"id": ann.id, "message": ann.message, "created_at": ann.created_at}
+
+    def fixes_stored(self, count: int) -> None:
+        second = int(monotonic())
+        slot = second % RATE_WINDOW_SECONDS
+        if self._ingest_second[slot] != second:
+            self._ingest_second[slot] = second
+            self._ingest[slot] = 0
+        self._ingest[slot] += count
+
+    # --------------------------------------------------------------------------
+    # Reads
+    # --------------------------------------------------------------------------
+    def ingest_rate(self) -> float:
+        """Stored fixes per second, averaged over the last minute."""
+        oldest = int(monotonic()) - RATE_WINDOW_SECONDS
+        total = sum(n for n, s in zip(self._ingest, self._ingest_second) if s > oldest)
+        return round(total / RATE_WINDOW_SECONDS, 2)
+
+    def reconcile(self, session: Session) -> None:
+        bus_total = session.exec(select(func.count()).select_from(models.Bus)).one()
+        users = Tally(dict(session.exec(
+            select(models.User.role, func.count()).group_by(models.User.role)
+        ).all()))
+        feedback = Tally(dict(session.exec(
+            select(models.Feedback.status, func.count()).group_by(models.Feedback.status)
+        ).all()))
+        latest = session.exec(
+            select(models.Announcement).order_by(models.Announcement.created_at.desc(), models.Announcement.id.desc())
+        ).first()
+
+        self.bus_total = bus_total
+        self.users_by_role = users
+        self.feedback_by_status = feedback
+        self.latest_announcement = None if latest is None else {
+            "id": latest.id, "message": latest.message, "created_at": latest.created_at,
+        }
+        self.reconciled = True
+
+    def snapshot(self) -> Dict[str, object]:
+        active = sum(1 for s in fleet_state.all() if s.active)
+        return {
+            "buses": {"total": self.bus_total, "active": active, "offline": max(0, self.bus_total - active)},
+            "users_by_role": {role: n for role, n in self.users_by_role.items() if n > 0},
+            "feedback_by_status": {status: n for status, n in self.feedback_by_status.items() if n > 0},
+            "latest_announcement": self.latest_announcement,
+            "ingest_per_second": self.ingest_rate(),
+        }
+
+
+admin_summary = AdminSummary()
@@ -0,0 +1,121 @@
+# app/services/export.py
+"""
+Streaming telemetry export (CSV or NDJSON, optionally gzipped).
+
+Rows are read in keyset pages (``id > last_id LIMIT n``). Each page is
+fetched whole on its own short-lived session, and the session is closed
+before any of its rows are yielded. Memory stays bounded by one page plus
+one output chunk whatever the export size. No connection or read
+transaction is held while the client drains the response. That matters on
+SQLite, where an open read transaction pins the WAL and blocks checkpoints
+for the whole download.
+
+``from``/``to`` may carry a UTC offset; they are converted to naive UTC to
+match the stored timestamps.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from sqlmodel import Session, select
+
+from app.core import fastjson
+from app.db.session import telemetry_engine
+from app.models import BusLocation
+
+PAGE_ROWS = 5000
+CHUNK_BYTES = 64 * 1024
+
+COLUMNS = (
+    "id", "bus_id", "timestamp", "latitude", "longitude", "is_active",
+    "current_stop", "next_stop", "eta", "extra",
+)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _pages(bus_id: Optional[int], start: Optional[datetime], end: Optional[datetime]) -> Iterator[tuple]:
+    last_id = 0
+    while True:
+        stmt = select(
+            BusLocation.id, BusLocation.bus_id, BusLocation.timestamp, BusLocation.latitude,
+            BusLocation.longitude, BusLocation.is_active, BusLocation.current_stop,
+            BusLocation.next_stop, BusLocation.eta, BusLocation.extra,
+        ).where(BusLocation.id > last_id)
+        if bus_id is not None:
+            stmt = stmt.where(BusLocation.bus_id == bus_id)
+        if start is not None:
+            stmt = stmt.where(BusLocation.timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(BusLocation.timestamp < end)
+        stmt = stmt.order_by(BusLocation.id).limit(PAGE_ROWS)
+
+        with Session(telemetry_engine) as session:
+            page = session.exec(stmt).all()
+        yield from page
+        if len(page) < PAGE_ROWS:
+            return
+        last_id = page[-1][0]
+
+
+def _csv_lines(rows: Iterator[tuple]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        values = list(row)
+        values[2] = values[2].isoformat() if values[2] else ""
+        values[9] = json.dumps(values[9]) if values[9] is not None else ""
+        writer.writerow(values)
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _ndjson_lines(rows: Iterator[tuple]) -> Iterator[bytes]:
+    parts = []
+    size = 0
+    for row in rows:
+        line = fastjson.dumps(dict(zip(COLUMNS, row))) + b"\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield b"".join(parts)
+            parts, size = [], 0
+    yield b"".join(parts)
+
+
+def stream_locations(
+    fmt: str,
+    bus_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    compress: bool = False,
+) -> Iterator[bytes]:
+    rows = _pages(bus_id, _naive_utc(start), _naive_utc(end))
+    if fmt == "csv":
+        chunks = (chunk.encode() for chunk in _csv_lines(rows))
+    else:
+        chunks = _ndjson_lines(rows)
+
+    if not compress:
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+        return
+
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        out = gz.compress(chunk)
+        if out:
+            yield out
+    yield gz.flush()
@@ -0,0 +1,64 @@
+# app/services/fast_reads.py
+"""
+Row builders for the fast read path.
+
+Each builder selects plain columns (no ORM identity map, no lazy loads) and
+returns dicts shaped exactly like the corresponding ``response_model`` output,
+so the fast and regular paths are interchangeable for clients.
+"""
+from typing import Any, Dict, List
+
+from sqlmodel import Session, select
+
+from app import models
+
+
+def stop_rows_by_route(session: Session) -> Dict[int, List[Dict[str, Any]]]:
+    S = models.Stop
+    grouped: Dict[int, List[Dict[str, Any]]] = {}
+    rows = session.exec(
+        select(S.id, S.route_id, S.name, S.latitude, S.longitude, S.order).order_by(S.id)
+    )
+    for sid, route_id, name, lat, lon, order in rows:
+        grouped.setdefault(route_id, []).append(
+            {"id": sid, "route_id": route_id, "name": name, "latitude": lat, "longitude": lon, "order": order}
+        )
+    return grouped
+
+
+def route_rows(session: Session) -> List[Dict[str, Any]]:
+    R = models.Route
+    return [{"name": name, "id": rid} for rid, name in session.exec(select(R.id, R.name))]
+
+
+def bus_rows(session: Session) -> List[Dict[str, Any]]:
+    """Same shape as List[BusRead]: nested route with its stops, in three queries total."""
+    B = models.Bus
+    routes = {rid: name for rid, name in session.exec(select(models.Route.id, models.Route.name))}
+    stops = stop_rows_by_route(session)
+    out = []
+    rows = session.exec(
+        select(B.id, B.name, B.route_id, B.driver_id, B.current_lat, B.current_lon, B.last_seen)
+    )
+    for bid, name, route_id, driver_id, lat, lon, last_seen in rows:
+        route = None
+        if route_id in routes:
+            route = {"id": route_id, "name": routes[route_id], "stops": stops.get(route_id, [])}
+        out.append({
+            "id": bid,
+            "name": name,
+            "route_id": route_id,
+            "driver_id": driver_id,
+            "current_lat": lat,
+            "current_lon": lon,
+            "last_seen": last_seen,
+            "route": route,
+            "stops": None,
+        })
+    return out
+
+
+def announcement_rows(session: Session) -> List[Dict[str, Any]]:
+    A = models.Announcement
+    rows = session.exec(select(A.message, A.id, A.created_at).order_by(A.created_at.desc()))
+    return [{"message": message, "id": aid, "created_at": created_at} for message, aid, created_at in rows]
@@ -0,0 +1,181 @@
+# app/services/fleet_state.py
+"""
+Latest known state of every bus, kept in memory and versioned.
+
+Every change bumps a global version and stamps it on the bus record. Records
+live in an OrderedDict ordered by last change, so a delta for ``since=v``
+walks backwards from the newest record and stops at the first one that is
+not newer than ``v``: O(changed buses), not O(fleet).
+
+Versions only mean something within one process, so clients get them as an
+opaque ``"<epoch>.<version>"`` token where the epoch is random per process.
+A token from before a restart, or from another worker, doesn't match and
+gets a full snapshot instead of a delta.
+"""
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import Bus
+from app.services.ingest_filter import haversine_m
+
+
+class BusState:
+    __slots__ = (
+        "bus_id", "lat", "lon", "speed", "heading", "current_stop", "next_stop",
+        "ts", "active", "version", "seq", "history",
+    )
+
+    def __init__(self, bus_id: int):
+        self.bus_id = bus_id
+        self.lat: Optional[float] = None
+        self.lon: Optional[float] = None
+        self.speed: Optional[float] = None
+        self.heading: Optional[float] = None
+        self.current_stop: Optional[str] = None
+        self.next_stop: Optional[str] = None
+        self.ts: Optional[datetime] = None
+        self.active = False
+        self.version = 0
+        self.seq: Optional[int] = None  # last client sequence number seen
+        # recent (ts, lat, lon) kept fixes, oldest first
+        self.history: Deque[Tuple[datetime, float, float]] = deque(maxlen=settings.LIVE_HISTORY_SIZE)
+
+
+class FleetState:
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._buses: "OrderedDict[int, BusState]" = OrderedDict()
+
+    def get(self, bus_id: int) -> Optional[BusState]:
+        return self._buses.get(bus_id)
+
+    def all(self) -> List[BusState]:
+        return list(self._buses.values())
+
+    def changed_since(self, version: int) -> List[BusState]:
+        """Records changed after ``version``, oldest change first."""
+        records = []
+        for state in reversed(self._buses.values()):
+            if state.version <= version:
+                break
+            records.append(state)
+        records.reverse()
+        return records
+
+    def _touch(self, state: BusState) -> None:
+        self.version += 1
+        state.version = self.version
+        self._buses.move_to_end(state.bus_id)
+
+    def update(
+        self,
+        bus_id: int,
+        lat: float,
+        lon: float,
+        ts: datetime,
+        speed: Optional[float] = None,
+        heading: Optional[float] = None,
+        current_stop: Optional[str] = None,
+        next_stop: Optional[str] = None,
+        active: bool = True,
+        seq: Optional[int] = None,
+    ) -> BusState:
+        state = self._buses.get(bus_id)
+        if state is None:
+            state = self._buses[bus_id] = BusState(bus_id)
+        elif speed is None and state.ts is not None and state.lat is not None:
+            # derive speed from the previous kept fix when the client didn't send one
+            dt = (ts - state.ts).total_seconds()
+            if dt > 0:
+                speed = haversine_m(state.lat, state.lon, lat, lon) / dt
+        state.lat, state.lon, state.ts = lat, lon, ts
+        state.speed = speed
+        state.heading = heading if heading is not None else state.heading
+        state.current_stop = current_stop if current_stop is not None else state.current_stop
+        state.next_stop = next_stop if next_stop is not None else state.next_stop
+        state.active = active
+        state.seq = seq if seq is not None else state.seq
+        state.history.append((ts, lat, lon))
+        self._touch(state)
+        return state
+
+    def mark_offline(self, bus_id: int) -> bool:
+        state = self._buses.get(bus_id)
+        if state is None or not state.active:
+            return False
+        state.active = False
+        self._touch(state)
+        return True
+
+    def token(self) -> str:
+        return f"{self.epoch}.{self.version}"
+
+    def _parse_token(self, token: Optional[str]) -> Optional[int]:
+        """Version from a token issued by this process, else None."""
+        epoch, _, version = (token or "").partition(".")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        version = int(version)
+        return version if version <= self.version else None
+
+    def snapshot(self, since: Optional[str] = None, now: Optional[datetime] = None) -> Dict[str, list]:
+        """
+        Columnar snapshot: parallel arrays indexed by position. A full snapshot
+        (``since`` is None, or a token from another process or incarnation)
+        lists active buses;
+        a delta lists every bus changed after ``since``, including ones that
+        just went offline (``active`` false) so clients can drop them.
+        """
+        now = now or datetime.utcnow()
+        version = self._parse_token(since)
+        if version is None:
+            records = [s for s in self._buses.values() if s.active]
+            full = True
+        else:
+            records = self.changed_since(version)
+            full = False
+
+        return {
+            "version": self.token(),
+            "full": full,
+            "bus_id": [s.bus_id for s in records],
+            "lat": [s.lat for s in records],
+            "lon": [s.lon for s in records],
+            "speed": [None if s.speed is None else round(s.speed, 2) for s in records],
+            "heading": [s.heading for s in records],
+            "current_stop": [s.current_stop for s in records],
+            "next_stop": [s.next_stop for s in records],
+            "age_s": [None if s.ts is None else round((now - s.ts).total_seconds(), 1) for s in records],
+            "active": [s.active for s in records],
+        }
+
+
+fleet_state = FleetState()
+
+
+def warm_from_db(session: Session) -> int:
+    """
+    Seeds live state from the persisted Bus positions (startup only). Buses
+    already restored from a newer checkpoint are left alone.
+    """
+    rows = session.exec(
+        select(Bus.id, Bus.current_lat, Bus.current_lon, Bus.last_seen).where(Bus.current_lat.is_not(None))
+    )
+    now = datetime.utcnow()
+    count = 0
+    for bus_id, lat, lon, last_seen in rows:
+        if lon is None or last_seen is None:
+            continue
+        existing = fleet_state.get(bus_id)
+        if existing is not None and existing.ts is not None and existing.ts >= last_seen:
+            continue
+        recent = (now - last_seen).total_seconds() <= settings.BUS_STALE_SECONDS
+        fleet_state.update(bus_id, lat, lon, last_seen, active=recent)
+        count += 1
+    return count
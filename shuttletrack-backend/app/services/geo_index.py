@@ -0,0 +1,145 @@
+# app/services/geo_index.py
+"""
+In-memory uniform grid index over live bus positions.
+
+Positions are bucketed into fixed lat/lon cells (GEO_CELL_DEGREES, ~1 km by
+default). An update moves a bus between two cell sets in O(1); a radius
+query only visits the cells overlapping the search circle's bounding box,
+then ranks candidates by exact haversine distance. When the box would cover
+more cells than there are buses we just scan every bus instead.
+"""
+import heapq
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import Bus
+from app.services.ingest_filter import haversine_m
+
+METERS_PER_DEGREE_LAT = 111_320.0
+
+
+class _Entry:
+    __slots__ = ("lat", "lon", "ts", "cell")
+
+    def __init__(self, lat: float, lon: float, ts: datetime, cell: Tuple[int, int]):
+        self.lat = lat
+        self.lon = lon
+        self.ts = ts
+        self.cell = cell
+
+
+class GeoIndex:
+    def __init__(self, cell_degrees: float = settings.GEO_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._entries: Dict[int, _Entry] = {}
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bus_ids(self) -> List[int]:
+        return list(self._entries)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def update(self, bus_id: int, lat: float, lon: float, ts: datetime) -> None:
+        cell = self._cell(lat, lon)
+        entry = self._entries.get(bus_id)
+        if entry is None:
+            self._entries[bus_id] = _Entry(lat, lon, ts, cell)
+        else:
+            if entry.cell != cell:
+                self._remove_from_cell(bus_id, entry.cell)
+            entry.lat, entry.lon, entry.ts, entry.cell = lat, lon, ts, cell
+        self._cells.setdefault(cell, set()).add(bus_id)
+
+    def remove(self, bus_id: int) -> None:
+        entry = self._entries.pop(bus_id, None)
+        if entry is not None:
+            self._remove_from_cell(bus_id, entry.cell)
+
+    def _remove_from_cell(self, bus_id: int, cell: Tuple[int, int]) -> None:
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(bus_id)
+            if not members:
+                del self._cells[cell]
+
+    def _candidates(self, lat: float, lon: float, radius_m: float):
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlon = radius_m / (METERS_PER_DEGREE_LAT * max(0.01, math.cos(math.radians(lat))))
+        lat0, lon0 = self._cell(lat - dlat, lon - dlon)
+        lat1, lon1 = self._cell(lat + dlat, lon + dlon)
+        if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > len(self._entries):
+            return self._entries.keys()
+        out: List[int] = []
+        for i in range(lat0, lat1 + 1):
+            for j in range(lon0, lon1 + 1):
+                members = self._cells.get((i, j))
+                if members:
+                    out.extend(members)
+        return out
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_m: float,
+        limit: int = 10,
+        max_age_s: Optional[float] = None,
+        now: Optional[datetime] = None,
+    ) -> List[dict]:
+        now = now or datetime.utcnow()
+        hits = []
+        for bus_id in list(self._candidates(lat, lon, radius_m)):
+            entry = self._entries.get(bus_id)
+            if entry is None:
+                continue
+            age = (now - entry.ts).total_seconds()
+            if max_age_s is not None and age > max_age_s:
+                continue
+            dist = haversine_m(lat, lon, entry.lat, entry.lon)
+            if dist <= radius_m:
+                hits.append((dist, bus_id, entry, age))
+        return [
+            {
+                "bus_id": bus_id,
+                "latitude": entry.lat,
+                "longitude": entry.lon,
+                "distance_m": round(dist, 1),
+                "last_seen": entry.ts.isoformat(),
+                "age_s": round(age, 1),
+            }
+            for dist, bus_id, entry, age in heapq.nsmallest(limit, hits, key=lambda h: h[0])
+        ]
+
+
+geo_index = GeoIndex()
+
+
+def warm_from_db(session: Session) -> int:
+    """
+    Seeds the index from the persisted Bus positions (startup only). Buses
+    not seen for BUS_STALE_SECONDS are left out, as the stale job would drop
+    them anyway.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.BUS_STALE_SECONDS)
+    rows = session.exec(
+        select(Bus.id, Bus.current_lat, Bus.current_lon, Bus.last_seen)
+        .where(Bus.current_lat.is_not(None), Bus.last_seen >= cutoff)
+    )
+    count = 0
+    for bus_id, lat, lon, last_seen in rows:
+        if lon is None or last_seen is None:
+            continue
+        entry = geo_index._entries.get(bus_id)
+        if entry is not None and entry.ts >= last_seen:
+            continue
+        geo_index.update(bus_id, lat, lon, last_seen)
+        count += 1
+    return count
@@ -0,0 +1,206 @@
+# app/services/ingest.py
+"""
+Shared location ingest path: sequence -> filter -> store -> broadcast.
+
+Used by both ``POST /buses/{bus_id}/location`` and the driver WebSocket
+channel, so a fix is treated the same no matter how it arrived. Callers are
+responsible for checking that the bus exists / the driver owns it.
+
+Every stored row holds the position exactly as the device reported it,
+whether the fix was new (filtered, then stored and broadcast) or late
+(stored without filtering). History exports and segment rollups therefore
+never mix raw and processed coordinates.
+
+Batches for the same bus run one at a time: a per-bus lock is held from
+sequencing through the commit to the live-state update, so the sequence
+window and the filter track only ever see one batch in flight. If the
+commit fails, the batch's own seqs are forgotten and the filter track goes
+back to its state before the batch. A retry of the same fixes is then
+classified exactly as on the first attempt, and isn't taken for a late or
+duplicate fix.
+
+The live state only moves forward: a batch whose newest kept fix is older
+than the bus's live position (e.g. a client clock that went back) is stored
+but neither applied nor broadcast. The broadcast itself runs after the lock
+is released, so a slow subscriber never holds up the bus's next batch.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+
+from app.models import BusLocation
+from app.routers.websocket_router import manager
+from app.services.admin_summary import admin_summary
+from app.services.fleet_state import fleet_state
+from app.services.geo_index import geo_index
+from app.services.ingest_filter import fix_filter
+from app.services.ingest_sequence import DUPLICATE, LATE, NEW, sequence_tracker
+
+
+class Fix(NamedTuple):
+    latitude: float
+    longitude: float
+    timestamp: datetime
+    accuracy: Optional[float] = None
+    speed: Optional[float] = None
+    heading: Optional[float] = None
+    current_stop: Optional[str] = None
+    next_stop: Optional[str] = None
+    eta: Optional[str] = None
+    is_active: bool = True
+    extra: Optional[dict] = None
+    seq: Optional[int] = None
+
+
+_bus_locks: Dict[int, asyncio.Lock] = {}
+
+
+def _commit(session: Session) -> None:
+    """
+    Runs in the thread pool. Flushing first assigns the row ids, and not
+    expiring on commit keeps them loaded, so callers reading ``row.id`` later
+    (on the event loop) don't trigger a reload SELECT per row.
+    """
+    session.flush()
+    expire = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire
+
+
+def parse_timestamp(value) -> datetime:
+    """ISO string or epoch milliseconds -> naive UTC datetime (server time on failure)."""
+    if value in (None, "", 0):
+        return datetime.utcnow()
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.utcfromtimestamp(value / 1000.0)
+        ts = datetime.fromisoformat(value)
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        return ts
+    except Exception:
+        return datetime.utcnow()
+
+
+async def ingest_fixes(
+    session: Session, bus_id: int, fixes: List[Fix]
+) -> List[Tuple[Optional[BusLocation], str]]:
+    """
+    Sequences and filters ``fixes`` (oldest first), stores the kept ones in a
+    single commit, updates the live state (fleet state + geo index; the Bus
+    row is written back periodically by the ``live_writeback`` job) and
+    broadcasts the newest kept fix. Returns one ``(row or None, reason)`` per
+    input fix, in order. The commit runs in the thread pool, off the event loop.
+
+    Fixes carrying a ``seq`` are classified first: duplicates are dropped
+    (reason ``duplicate_seq``), late ones are stored as sent but skip the
+    filter, the live state and the broadcast (reason ``late``).
+    """
+    lock = _bus_locks.get(bus_id)
+    if lock is None:
+        lock = _bus_locks[bus_id] = asyncio.Lock()
+    async with lock:
+        results, latest = await _store(session, bus_id, fixes)
+    if latest is not None:
+        await manager.broadcast_to_bus(str(bus_id), latest)
+    return results
+
+
+async def _store(
+    session: Session, bus_id: int, fixes: List[Fix]
+) -> Tuple[List[Tuple[Optional[BusLocation], str]], Optional[dict]]:
+    """ingest_fixes under the bus's lock; also returns the message to broadcast, if any."""
+    results: List[Tuple[Optional[BusLocation], str]] = []
+    rows: List[BusLocation] = []
+    latest: Optional[dict] = None
+    marked: List[int] = []
+    saved_window = sequence_tracker.save(bus_id)
+    saved_track = fix_filter.save(bus_id)
+
+    for fix in fixes:
+        # before sequencing: late fixes skip the filter, and a bad fix mustn't use up its seq
+        invalid = fix_filter.invalid(fix.latitude, fix.longitude)
+        if invalid:
+            results.append((None, invalid))
+            continue
+        order = NEW if fix.seq is None else sequence_tracker.check(bus_id, fix.seq)
+        if order == DUPLICATE:
+            results.append((None, "duplicate_seq"))
+            continue
+        if fix.seq is not None:
+            marked.append(fix.seq)
+        if order == LATE:
+            position, reason = (fix.latitude, fix.longitude), "late"
+        else:
+            position, reason = fix_filter.check(
+                bus_id, fix.latitude, fix.longitude, fix.timestamp, fix.accuracy
+            )
+            if position is None:
+                results.append((None, reason))
+                continue
+        loc = BusLocation(
+            bus_id=bus_id,
+            latitude=position[0],
+            longitude=position[1],
+            is_active=fix.is_active if fix.is_active is not None else True,
+            current_stop=fix.current_stop,
+            next_stop=fix.next_stop,
+            eta=fix.eta,
+            extra=fix.extra,
+            timestamp=fix.timestamp,
+            client_seq=fix.seq,
+        )
+        session.add(loc)
+        rows.append(loc)
+        results.append((loc, reason))
+        if order == LATE:
+            continue
+        latest = {
+            "type": "location_update",
+            "bus_id": bus_id,
+            "latitude": position[0],
+            "longitude": position[1],
+            "timestamp": fix.timestamp.isoformat(),
+        }
+        last_ts = fix.timestamp
+        last_fix = fix
+
+    if not rows:
+        return results, None
+
+    try:
+        await run_in_threadpool(_commit, session)
+    except Exception:
+        session.rollback()
+        sequence_tracker.undo(bus_id, saved_window, marked)
+        fix_filter.restore(bus_id, saved_track)
+        raise
+
+    admin_summary.fixes_stored(len(rows))
+
+    if latest is None:
+        return results, None
+    live = fleet_state.get(bus_id)
+    if live is not None and live.ts is not None and last_ts < live.ts:
+        return results, None
+
+    geo_index.update(bus_id, latest["latitude"], latest["longitude"], last_ts)
+    fleet_state.update(
+        bus_id,
+        latest["latitude"],
+        latest["longitude"],
+        last_ts,
+        speed=last_fix.speed,
+        heading=last_fix.heading,
+        current_stop=last_fix.current_stop,
+        next_stop=last_fix.next_stop,
+        active=bool(last_fix.is_active),
+        seq=sequence_tracker.high(bus_id),
+    )
+    return results, latest
@@ -0,0 +1,196 @@
+# app/services/ingest_filter.py
+"""
+Per-bus GPS fix filter applied before a fix is stored or broadcast.
+
+For every bus we keep one small track record (last kept position and the
+stationary back-off), so each check is O(1) and the whole filter holds
+O(buses) memory.
+
+A fix is dropped when it is:
+- not a position at all (NaN/inf, or latitude/longitude out of range),
+- a duplicate or arrives with a timestamp not newer than the last kept fix,
+- too inaccurate to be useful (reported ``accuracy`` above the limit),
+- an impossible jump (implied speed above the speed gate),
+- stationary (moved less than the noise floor) and the stationary keep-alive
+  interval has not elapsed yet; that interval doubles while the bus stays
+  parked, so a bus waiting at the gate produces a handful of rows, not 1200,
+- sent faster than the minimum interval while moving.
+
+Kept fixes are stored and broadcast exactly as the device reported them.
+The filter only decides whether to keep a fix; smoothing a moving bus with a
+constant-position model would persist a point that lags it.
+
+The track also remembers when the bus was last verified to exist, so the
+HTTP ingest path re-checks the Bus row every INGEST_BUS_RECHECK_SECONDS, not
+on every fix. Deleting a Bus through the ORM drops its track at once.
+"""
+import copy
+import math
+from datetime import datetime
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.models import Bus
+
+EARTH_RADIUS_M = 6_371_000.0
+DEFAULT_ACCURACY_M = 20.0
+# Consecutive speed-gate rejections after which we assume the bus really moved
+# (e.g. GPS was off) and re-seed the track at the new position.
+MAX_CONSECUTIVE_JUMPS = 3
+
+INGEST_ACCEPTED = Counter(
+    "shuttletrack_ingest_accepted_fixes_total",
+    "GPS fixes kept by the ingest filter",
+)
+INGEST_DROPPED = Counter(
+    "shuttletrack_ingest_dropped_fixes_total",
+    "GPS fixes dropped by the ingest filter, by reason",
+    ("reason",),
+)
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_position(lat: float, lon: float) -> bool:
+    return math.isfinite(lat) and math.isfinite(lon) and -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+
+class _Track:
+    __slots__ = ("lat", "lon", "ts", "keepalive", "jumps", "verified")
+
+    def __init__(self, lat: float, lon: float, ts: datetime, keepalive: float):
+        self.lat = lat
+        self.lon = lon
+        self.ts = ts
+        self.keepalive = keepalive
+        self.jumps = 0
+        self.verified = monotonic()
+
+
+class FixFilter:
+    def __init__(
+        self,
+        min_move_m: float = settings.INGEST_MIN_MOVE_METERS,
+        min_interval_s: float = settings.INGEST_MIN_INTERVAL_SECONDS,
+        max_speed_mps: float = settings.INGEST_MAX_SPEED_MPS,
+        max_accuracy_m: float = settings.INGEST_MAX_ACCURACY_METERS,
+        stationary_keepalive_s: float = settings.INGEST_STATIONARY_KEEPALIVE_SECONDS,
+        stationary_max_keepalive_s: float = settings.INGEST_STATIONARY_MAX_KEEPALIVE_SECONDS,
+    ):
+        self.min_move_m = min_move_m
+        self.min_interval_s = min_interval_s
+        self.max_speed_mps = max_speed_mps
+        self.max_accuracy_m = max_accuracy_m
+        self.stationary_keepalive_s = stationary_keepalive_s
+        self.stationary_max_keepalive_s = stationary_max_keepalive_s
+        self._tracks: Dict[int, _Track] = {}
+
+    def known(self, bus_id: int) -> bool:
+        """True if the bus was seen and verified to exist recently."""
+        track = self._tracks.get(bus_id)
+        return track is not None and monotonic() - track.verified < settings.INGEST_BUS_RECHECK_SECONDS
+
+    def mark_verified(self, bus_id: int) -> None:
+        track = self._tracks.get(bus_id)
+        if track is not None:
+            track.verified = monotonic()
+
+    def reset(self, bus_id: int) -> None:
+        self._tracks.pop(bus_id, None)
+
+    def save(self, bus_id: int) -> Optional[_Track]:
+        """Copy of the bus's track, to ``restore`` if the fixes it admitted fail to store."""
+        track = self._tracks.get(bus_id)
+        return None if track is None else copy.copy(track)
+
+    def restore(self, bus_id: int, saved: Optional[_Track]) -> None:
+        if saved is None:
+            self._tracks.pop(bus_id, None)
+        else:
+            self._tracks[bus_id] = saved
+
+    def _drop(self, reason: str) -> Tuple[None, str]:
+        INGEST_DROPPED.inc(reason)
+        return None, reason
+
+    def invalid(self, lat: float, lon: float) -> Optional[str]:
+        """Drop reason for coordinates that can't be a position, else None."""
+        if not valid_position(lat, lon):
+            INGEST_DROPPED.inc("invalid_position")
+            return "invalid_position"
+        return None
+
+    def check(
+        self,
+        bus_id: int,
+        lat: float,
+        lon: float,
+        ts: datetime,
+        accuracy: Optional[float] = None,
+    ) -> Tuple[Optional[Tuple[float, float]], str]:
+        """
+        Returns ``((lat, lon), "accepted")`` with the reported position for a
+        fix that should be kept, or ``(None, reason)`` for a dropped one.
+        """
+        reason = self.invalid(lat, lon)
+        if reason:
+            return None, reason
+        acc = accuracy if accuracy and accuracy > 0 else DEFAULT_ACCURACY_M
+        if acc > self.max_accuracy_m:
+            return self._drop("low_accuracy")
+
+        track = self._tracks.get(bus_id)
+        if track is None:
+            self._tracks[bus_id] = _Track(lat, lon, ts, self.stationary_keepalive_s)
+            INGEST_ACCEPTED.inc()
+            return (lat, lon), "accepted"
+
+        dt = (ts - track.ts).total_seconds()
+        if dt <= 0:
+            return self._drop("duplicate")
+
+        dist = haversine_m(track.lat, track.lon, lat, lon)
+
+        # speed gate: allow for the position uncertainty on both ends
+        if dist - acc > self.max_speed_mps * dt:
+            track.jumps += 1
+            if track.jumps < MAX_CONSECUTIVE_JUMPS:
+                return self._drop("impossible_jump")
+            self._tracks[bus_id] = _Track(lat, lon, ts, self.stationary_keepalive_s)
+            INGEST_ACCEPTED.inc()
+            return (lat, lon), "accepted"
+        track.jumps = 0
+
+        if dist < max(self.min_move_m, acc):
+            # parked: keep one fix per keep-alive interval, backing off exponentially
+            if dt < track.keepalive:
+                return self._drop("stationary")
+            track.keepalive = min(track.keepalive * 2, self.stationary_max_keepalive_s)
+        else:
+            if dt < self.min_interval_s:
+                return self._drop("too_frequent")
+            track.keepalive = self.stationary_keepalive_s
+
+        track.lat, track.lon, track.ts = lat, lon, ts
+
+        INGEST_ACCEPTED.inc()
+        return (lat, lon), "accepted"
+
+
+fix_filter = FixFilter()
+
+
+@event.listens_for(Bus, "after_delete")
+def _forget_deleted_bus(mapper, connection, target):
+    fix_filter.reset(target.id)
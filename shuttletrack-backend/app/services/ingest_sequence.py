@@ -0,0 +1,131 @@
+# app/services/ingest_sequence.py
+"""
+Per-bus client sequence tracking for idempotent, ordered ingest.
+
+Clients number their fixes (``seq``). For every bus we keep the high-water
+mark and a bitmask of which of the INGEST_SEQ_WINDOW seqs below it have
+been seen, so classifying a fix is O(1):
+
+- ``new``:       above the high-water mark; filtered, stored and broadcast
+- ``late``:      below the mark and not seen yet (a retry that overtook, or a
+                 batch flushed after reconnect); stored but not broadcast,
+                 so markers never jump backwards
+- ``duplicate``: already seen; dropped without touching the DB
+
+Seqs older than the window are classed as ``late`` and stored. Dedupe is
+window-only: there is deliberately no DB constraint on
+``(bus_id, client_seq)``, because a seq far below the mark
+(INGEST_SEQ_RESET_GAP) means the device started a new numbering. The window
+is then re-based on it, and the new numbers legitimately repeat old ones.
+The cost is that a retry can be stored twice whenever the window doesn't
+know its first attempt:
+
+- it is older than the window (a restored checkpoint keeps at most 64 seqs)
+- it arrives after a restart without a checkpoint, or after a crash when
+  its first attempt was stored after the last periodic checkpoint
+- it lands on another worker: windows are per process
+"""
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+NEW = "new"
+LATE = "late"
+DUPLICATE = "duplicate"
+
+INGEST_SEQUENCE = Counter(
+    "shuttletrack_ingest_sequence_total",
+    "Sequenced GPS fixes, by order class (new, late, duplicate, reset)",
+    ("order",),
+)
+
+
+class _Window:
+    __slots__ = ("high", "seen")
+
+    def __init__(self, high: int):
+        self.high = high
+        self.seen = 1  # bit i set: seq high - i was seen
+
+
+class SequenceTracker:
+    def __init__(self, window: int = settings.INGEST_SEQ_WINDOW, reset_gap: int = settings.INGEST_SEQ_RESET_GAP):
+        self.window = window
+        self.reset_gap = reset_gap
+        self._mask = (1 << window) - 1
+        self._buses: Dict[int, _Window] = {}
+
+    def high(self, bus_id: int) -> Optional[int]:
+        w = self._buses.get(bus_id)
+        return None if w is None else w.high
+
+    def seed(self, bus_id: int, high: int, seen: int = 1) -> None:
+        """Starts tracking from a known window (e.g. a restored checkpoint)."""
+        if bus_id not in self._buses:
+            w = self._buses[bus_id] = _Window(high)
+            w.seen = (seen & self._mask) | 1
+
+    def check(self, bus_id: int, seq: int) -> str:
+        w = self._buses.get(bus_id)
+        if w is None:
+            self._buses[bus_id] = _Window(seq)
+            INGEST_SEQUENCE.inc(NEW)
+            return NEW
+
+        if seq > w.high:
+            shift = seq - w.high
+            w.seen = ((w.seen << shift) | 1) & self._mask if shift < self.window else 1
+            w.high = seq
+            INGEST_SEQUENCE.inc(NEW)
+            return NEW
+
+        behind = w.high - seq
+        if behind > self.reset_gap:
+            self._buses[bus_id] = _Window(seq)
+            INGEST_SEQUENCE.inc("reset")
+            return NEW
+        if behind < self.window:
+            bit = 1 << behind
+            if w.seen & bit:
+                INGEST_SEQUENCE.inc(DUPLICATE)
+                return DUPLICATE
+            w.seen |= bit
+        INGEST_SEQUENCE.inc(LATE)
+        return LATE
+
+    def save(self, bus_id: int) -> Optional[Tuple[int, int]]:
+        """The bus's window as ``(high, seen)``: for checkpoints, and for ``undo`` if a store fails."""
+        w = self._buses.get(bus_id)
+        return None if w is None else (w.high, w.seen)
+
+    def undo(self, bus_id: int, saved: Optional[Tuple[int, int]], seqs: List[int]) -> None:
+        """
+        Forgets ``seqs`` (the seqs one batch marked, whose store failed) so the
+        client's retry is classified as on the first attempt. Only their bits
+        are cleared; if the batch raised the high-water mark, the window moves
+        back to ``saved`` (its state before the batch) and the bits the shift
+        pushed out are taken from there. A batch that created or re-based the
+        window is reverted to ``saved`` as a whole.
+        """
+        w = self._buses.get(bus_id)
+        if w is None:
+            return
+        if saved is None:
+            del self._buses[bus_id]
+            return
+        high, seen = saved
+        if w.high < high:
+            w.high, w.seen = high, seen
+            return
+        for seq in seqs:
+            behind = w.high - seq
+            if 0 <= behind < self.window:
+                w.seen &= ~(1 << behind)
+        shift = w.high - high
+        if shift:
+            kept = self.window - shift
+            w.seen = (w.seen >> shift) | (seen & ~((1 << kept) - 1)) if kept > 0 else seen
+            w.high = high
+
+sequence_tracker = SequenceTracker()
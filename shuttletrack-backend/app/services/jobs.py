@@ -0,0 +1,157 @@
+# app/services/jobs.py
+"""
+Periodic maintenance jobs registered with the in-app scheduler.
+
+- stale_buses: marks buses with no fix for BUS_STALE_SECONDS offline, drops
+  them from the live indexes and broadcasts ``bus_offline``; also drops geo
+  index entries with no active fleet state behind them. Runs in every
+  worker, because live state and subscribers are per process.
+- live_writeback: persists the latest in-memory position of each changed bus
+  to its Bus row (current_lat/current_lon/last_seen), so the hot ingest path
+  doesn't write the Bus table on every fix. Also per process; a row is only
+  overwritten by a newer fix.
+- telemetry_retention: deletes BusLocation rows older than
+  TELEMETRY_RETENTION_DAYS in small batches. Leader only.
+- live_checkpoint: writes live fleet state to LIVE_CHECKPOINT_PATH for warm
+  restarts (app/services/live_checkpoint.py). Per process.
+- summary_reconcile: recounts the admin summary counters from the DB
+  (app/services/admin_summary.py). Per process.
+- segment_rollup: folds new BusLocation rows into stop-to-stop travel-time
+  stats (app/services/segment_rollup.py). Leader only.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import delete, func, or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine, open_session, telemetry_engine
+from app.models import Bus, BusLocation
+from app.routers.websocket_router import manager
+from app.services import read_cache
+from app.services.admin_summary import admin_summary
+from app.services.fleet_state import fleet_state
+from app.services.geo_index import geo_index
+from app.services.live_checkpoint import checkpoint_job
+from app.services.scheduler import Scheduler
+from app.services.segment_rollup import run_segment_rollup
+
+RETENTION_BATCH = 5000
+
+
+# ------------------------------------------------------------------------------
+# Stale-bus detection
+# ------------------------------------------------------------------------------
+def _deactivate_latest_locations(bus_ids: List[int]) -> None:
+    latest = (
+        select(func.max(BusLocation.id))
+        .where(BusLocation.bus_id.in_(bus_ids))
+        .group_by(BusLocation.bus_id)
+    )
+    with Session(telemetry_engine) as session:
+        session.exec(update(BusLocation).where(BusLocation.id.in_(latest)).values(is_active=False))
+        session.commit()
+
+
+async def detect_stale_buses() -> None:
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.BUS_STALE_SECONDS)
+    stale = [s for s in fleet_state.all() if s.active and s.ts is not None and s.ts < cutoff]
+
+    for bus_id in geo_index.bus_ids():
+        state = fleet_state.get(bus_id)
+        if state is None or not state.active:
+            geo_index.remove(bus_id)
+    if not stale:
+        return
+
+    for state in stale:
+        fleet_state.mark_offline(state.bus_id)
+        geo_index.remove(state.bus_id)
+    await asyncio.to_thread(_deactivate_latest_locations, [s.bus_id for s in stale])
+
+    for state in stale:
+        await manager.broadcast_to_bus(
+            str(state.bus_id),
+            {"type": "bus_offline", "bus_id": state.bus_id, "last_seen": state.ts.isoformat()},
+        )
+
+
+# ------------------------------------------------------------------------------
+# Live-state write-back
+# ------------------------------------------------------------------------------
+_written_version = 0
+
+
+def _write_positions(rows: List[Tuple[int, float, float, datetime]]) -> None:
+    with Session(engine) as session:
+        for bus_id, lat, lon, ts in rows:
+            session.exec(
+                update(Bus)
+                .where(Bus.id == bus_id)
+                .where(or_(Bus.last_seen.is_(None), Bus.last_seen < ts))
+                .values(current_lat=lat, current_lon=lon, last_seen=ts)
+            )
+        session.commit()
+
+
+async def write_back_live_state() -> None:
+    global _written_version
+    target = fleet_state.version
+    # collect on the event loop: fleet state is only mutated there
+    rows = [
+        (s.bus_id, s.lat, s.lon, s.ts)
+        for s in fleet_state.changed_since(_written_version)
+        if s.lat is not None and s.ts is not None
+    ]
+    if rows:
+        await asyncio.to_thread(_write_positions, rows)
+        read_cache.bump("buses")
+    _written_version = target
+
+
+# ------------------------------------------------------------------------------
+# Telemetry retention
+# ------------------------------------------------------------------------------
+def prune_telemetry() -> int:
+    cutoff = datetime.utcnow() - timedelta(days=settings.TELEMETRY_RETENTION_DAYS)
+    total = 0
+    while True:
+        batch = select(BusLocation.id).where(BusLocation.timestamp < cutoff).limit(RETENTION_BATCH)
+        with Session(telemetry_engine) as session:
+            result = session.exec(delete(BusLocation).where(BusLocation.id.in_(batch)))
+            session.commit()
+        total += result.rowcount
+        if result.rowcount < RETENTION_BATCH:
+            return total
+
+
+# ------------------------------------------------------------------------------
+# Admin summary reconcile
+# ------------------------------------------------------------------------------
+def reconcile_summary() -> None:
+    with Session(engine) as session:
+        admin_summary.reconcile(session)
+
+
+# ------------------------------------------------------------------------------
+# Segment travel-time rollup
+# ------------------------------------------------------------------------------
+def rollup_segments() -> int:
+    with open_session() as session:  # reads buses/stops from main
+        return run_segment_rollup(session)
+
+
+def register_jobs(scheduler: Scheduler) -> None:
+    scheduler.add_job("stale_buses", detect_stale_buses, settings.STALE_CHECK_INTERVAL_SECONDS)
+    scheduler.add_job("live_writeback", write_back_live_state, settings.LIVE_WRITEBACK_INTERVAL_SECONDS)
+    if settings.LIVE_CHECKPOINT_PATH:
+        scheduler.add_job("live_checkpoint", checkpoint_job, settings.LIVE_CHECKPOINT_INTERVAL_SECONDS)
+    scheduler.add_job("summary_reconcile", reconcile_summary, settings.SUMMARY_RECONCILE_INTERVAL_SECONDS)
+    scheduler.add_job(
+        "telemetry_retention", prune_telemetry, settings.TELEMETRY_RETENTION_INTERVAL_SECONDS, leader_only=True
+    )
+    scheduler.add_job(
+        "segment_rollup", rollup_segments, settings.SEGMENT_ROLLUP_INTERVAL_SECONDS, leader_only=True
+    )
@@ -0,0 +1,52 @@
+# app/services/read_cache.py
+"""
+Versioned cache of pre-rendered JSON bodies for hot list endpoints.
+
+Write paths call ``bump(name)`` after committing; readers call
+``get_or_build(name, build)`` and get the cached bytes for the current data
+version. The cache is per process, so entries also expire after
+FAST_CACHE_TTL_SECONDS to bound staleness when another worker did the write.
+"""
+from time import monotonic
+from typing import Callable, Dict, Tuple
+
+from app.core import fastjson
+from app.core.config import settings
+from app.core.metrics import Counter
+
+READ_CACHE = Counter(
+    "shuttletrack_read_cache_total",
+    "Pre-rendered response cache lookups, by dataset and result",
+    ("dataset", "result"),
+)
+
+_versions: Dict[str, int] = {}
+# name -> (version, built_at, body, compressed variants by encoding)
+_entries: Dict[str, Tuple[int, float, bytes, Dict[str, bytes]]] = {}
+
+
+def version(name: str) -> int:
+    return _versions.get(name, 0)
+
+
+def bump(*names: str) -> None:
+    for name in names:
+        _versions[name] = _versions.get(name, 0) + 1
+
+
+def get_or_build(name: str, build: Callable[[], object]) -> Tuple[bytes, Dict[str, bytes]]:
+    current = _versions.get(name, 0)
+    entry = _entries.get(name)
+    if (
+        entry is not None
+        and entry[0] == current
+        and monotonic() - entry[1] < settings.FAST_CACHE_TTL_SECONDS
+    ):
+        READ_CACHE.inc(name, "hit")
+        return entry[2], entry[3]
+
+    READ_CACHE.inc(name, "miss")
+    body = fastjson.dumps(build())
+    variants: Dict[str, bytes] = {}
+    _entries[name] = (current, monotonic(), body, variants)
+    return body, variants
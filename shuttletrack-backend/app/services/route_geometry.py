@@ -0,0 +1,159 @@
+# app/services/route_geometry.py
+"""
+Precomputed per-route geometry for map clients.
+
+For each route: stops in order, their coordinates, cumulative distance along
+the route at every stop, bounding box and a Google encoded polyline. The
+response body is rendered once and its ETag is derived from the bytes, so
+``GET /routes/{id}/geometry`` is a dict lookup and usually a 304. The ETag
+is weak: the same tag covers the identity, gzip and brotli bodies, which
+carry the same JSON.
+
+Any committed ORM write to a Route or Stop drops the route's entry (session
+events below), and the route endpoints rebuild it right after their commit.
+Bulk ``query(...).delete()`` bypasses the ORM events, so callers using it
+must ``recompute``/``discard`` themselves, as routes_router does. The cache
+is per process, so entries also expire after FAST_CACHE_TTL_SECONDS to bound
+staleness when another worker did the write; a rebuilt body usually has the
+same ETag, so clients keep getting 304s.
+"""
+import hashlib
+from time import monotonic
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app import models
+from app.core import fastjson
+from app.core.config import settings
+from app.services.ingest_filter import haversine_m
+
+
+def encode_polyline(coords: List[Tuple[float, float]], precision: int = 5) -> str:
+    """Google encoded polyline algorithm format."""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coords:
+        ilat, ilon = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lon = ilat, ilon
+    return "".join(out)
+
+
+class RouteGeometry:
+    __slots__ = (
+        "route_id", "name", "stops", "coords", "cumulative_m", "bbox", "polyline",
+        "body", "etag", "variants", "built_at",
+    )
+
+    def __init__(self, route_id: int, name: str, stops: List[Tuple[str, float, float]]):
+        self.route_id = route_id
+        self.name = name
+        self.stops = [s[0] for s in stops]
+        self.coords = [(s[1], s[2]) for s in stops]
+
+        cumulative = [0.0]
+        for (lat1, lon1), (lat2, lon2) in zip(self.coords, self.coords[1:]):
+            cumulative.append(cumulative[-1] + haversine_m(lat1, lon1, lat2, lon2))
+        self.cumulative_m = cumulative if self.coords else []
+
+        if self.coords:
+            lats = [c[0] for c in self.coords]
+            lons = [c[1] for c in self.coords]
+            self.bbox: Optional[List[float]] = [min(lats), min(lons), max(lats), max(lons)]
+        else:
+            self.bbox = None
+        self.polyline = encode_polyline(self.coords)
+
+        self.body = fastjson.dumps({
+            "id": route_id,
+            "name": name,
+            "stops": self.stops,
+            "polyline": self.polyline,
+            "cumulative_m": [round(d) for d in self.cumulative_m],
+            "length_m": round(self.cumulative_m[-1]) if self.cumulative_m else 0,
+            "bbox": self.bbox,
+        })
+        self.etag = 'W/"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self.variants: Dict[str, bytes] = {}
+        self.built_at = monotonic()
+
+    def matches(self, if_none_match: str) -> bool:
+        """Weak comparison against an If-None-Match header."""
+        if if_none_match.strip() == "*":
+            return True
+        tag = self.etag[2:]
+        return any(t.strip().removeprefix("W/") == tag for t in if_none_match.split(","))
+
+
+_geometries: Dict[int, RouteGeometry] = {}
+
+
+def build(session: Session, route_id: int) -> Optional[RouteGeometry]:
+    route = session.get(models.Route, route_id)
+    if route is None:
+        return None
+    S = models.Stop
+    rows = session.exec(
+        select(S.name, S.latitude, S.longitude)
+        .where(S.route_id == route_id)
+        .order_by(S.order, S.id)
+    )
+    # stops without coordinates (0, 0 placeholders) can't be drawn
+    stops = [(name, lat, lon) for name, lat, lon in rows if lat or lon]
+    return RouteGeometry(route_id, route.name, stops)
+
+
+def recompute(session: Session, route_id: int) -> Optional[RouteGeometry]:
+    geometry = build(session, route_id)
+    if geometry is None:
+        _geometries.pop(route_id, None)
+    else:
+        _geometries[route_id] = geometry
+    return geometry
+
+
+def discard(route_id: int) -> None:
+    _geometries.pop(route_id, None)
+
+
+def get(session: Session, route_id: int) -> Optional[RouteGeometry]:
+    geometry = _geometries.get(route_id)
+    if geometry is not None and monotonic() - geometry.built_at < settings.FAST_CACHE_TTL_SECONDS:
+        return geometry
+    return recompute(session, route_id)
+
+
+# ------------------------------------------------------------------------------
+# Invalidation on Route / Stop writes
+# ------------------------------------------------------------------------------
+def _touched_routes(session: OrmSession) -> Set[int]:
+    return session.info.setdefault("route_geometry_touched", set())
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_route_writes(session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.Route) and obj.id is not None:
+            _touched_routes(session).add(obj.id)
+        elif isinstance(obj, models.Stop) and obj.route_id is not None:
+            _touched_routes(session).add(obj.route_id)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _discard_written_routes(session) -> None:
+    for route_id in session.info.pop("route_geometry_touched", ()):
+        discard(route_id)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_route_writes(session) -> None:
+    session.info.pop("route_geometry_touched", None)
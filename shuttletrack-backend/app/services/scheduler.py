@@ -0,0 +1,182 @@
+# app/services/scheduler.py
+"""
+Lightweight asyncio job scheduler, started from the FastAPI lifespan.
+
+Each job runs in its own task: sleep ``interval`` (plus random jitter so
+workers don't fire in lockstep), run, repeat. Sync job functions run in a
+worker thread so DB work never blocks the event loop.
+
+Jobs marked ``leader_only`` run in just one process: workers compete for a
+lease row in the ``schedulerlease`` table and the holder renews it every
+third of SCHEDULER_LEASE_SECONDS. If the leader dies its lease expires and
+another worker takes over.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.db.session import engine
+from app.models import SchedulerLease
+
+logger = logging.getLogger("uvicorn.error")
+
+JOB_DURATION = Histogram(
+    "shuttletrack_job_duration_seconds",
+    "Scheduled job run time",
+    ("job",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0),
+)
+JOB_RUNS = Counter(
+    "shuttletrack_job_runs_total",
+    "Scheduled job runs, by outcome",
+    ("job", "outcome"),
+)
+
+LEASE_NAME = "scheduler"
+
+
+class Job:
+    __slots__ = ("name", "func", "interval", "jitter", "leader_only", "runs", "errors", "last_duration")
+
+    def __init__(self, name: str, func: Callable, interval: float, jitter: float = 0.1, leader_only: bool = False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter  # fraction of interval
+        self.leader_only = leader_only
+        self.runs = 0
+        self.errors = 0
+        self.last_duration: Optional[float] = None
+
+
+class Scheduler:
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, func: Callable, interval: float, jitter: float = 0.1, leader_only: bool = False) -> Job:
+        job = Job(name, func, interval, jitter, leader_only)
+        self._jobs[name] = job
+        return job
+
+    def jobs(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    # --------------------------------------------------------------------------
+    # Leader election
+    # --------------------------------------------------------------------------
+    def _acquire_lease(self) -> bool:
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS)
+        with Session(engine) as session:
+            result = session.exec(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == LEASE_NAME)
+                .where((SchedulerLease.owner == self.owner) | (SchedulerLease.expires_at < now))
+                .values(owner=self.owner, expires_at=expires)
+            )
+            session.commit()
+            if result.rowcount:
+                return True
+            if session.get(SchedulerLease, LEASE_NAME) is not None:
+                return False
+            try:
+                session.add(SchedulerLease(name=LEASE_NAME, owner=self.owner, expires_at=expires))
+                session.commit()
+                return True
+            except IntegrityError:
+                session.rollback()
+                return False
+
+    def _release_lease(self) -> None:
+        with Session(engine) as session:
+            session.exec(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == LEASE_NAME)
+                .where(SchedulerLease.owner == self.owner)
+                .values(expires_at=datetime.utcnow())
+            )
+            session.commit()
+
+    async def _renew_leadership(self) -> None:
+        try:
+            leader = await asyncio.to_thread(self._acquire_lease)
+        except Exception:
+            # can't prove we still hold the lease: step down until the next renewal
+            if self.is_leader:
+                logger.warning("Scheduler %s lost leadership (lease renewal failed)", self.owner)
+            self.is_leader = False
+            raise
+        if leader != self.is_leader:
+            logger.info("Scheduler %s %s leadership", self.owner, "acquired" if leader else "lost")
+        self.is_leader = leader
+
+    # --------------------------------------------------------------------------
+    # Running
+    # --------------------------------------------------------------------------
+    async def run_job(self, job: Job) -> None:
+        start = perf_counter()
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                await job.func()
+            else:
+                await asyncio.to_thread(job.func)
+            JOB_RUNS.inc(job.name, "ok")
+        except Exception:
+            job.errors += 1
+            JOB_RUNS.inc(job.name, "error")
+            logger.exception("Scheduled job %s failed", job.name)
+        finally:
+            job.runs += 1
+            job.last_duration = perf_counter() - start
+            JOB_DURATION.observe(job.last_duration, job.name)
+
+    async def _loop(self, job: Job) -> None:
+        while True:
+            spread = job.interval * job.jitter
+            await asyncio.sleep(max(0.0, job.interval + random.uniform(-spread, spread)))
+            if job.leader_only and not self.is_leader:
+                continue
+            await self.run_job(job)
+
+    async def start(self) -> None:
+        if not settings.SCHEDULER_ENABLED:
+            return
+        try:
+            await self._renew_leadership()
+        except Exception:
+            logger.exception("Scheduler lease acquisition failed")
+        lease_job = Job("leader_lease", self._renew_leadership, settings.SCHEDULER_LEASE_SECONDS / 3, jitter=0.1)
+        for job in [lease_job, *self._jobs.values()]:
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+        logger.info("Scheduler started (%d jobs, leader=%s)", len(self._jobs), self.is_leader)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self.is_leader:
+            try:
+                await asyncio.to_thread(self._release_lease)
+            except Exception:
+                logger.exception("Scheduler lease release failed")
+            self.is_leader = False
+
+
+scheduler = Scheduler()
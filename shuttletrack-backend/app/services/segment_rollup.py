@@ -0,0 +1,216 @@
+# app/services/segment_rollup.py
+"""
+Incremental stop-to-stop travel-time statistics.
+
+Each run reads BusLocation rows after the stored watermark (keyset batches,
+so memory doesn't depend on history size), works out which stop each fix is
+at, and records a traversal whenever a bus reaches the next stop in route
+order (the next position in the route's ordered stop list, so gaps in
+``Stop.order`` don't matter). The traversal time is measured from the last
+fix at the previous stop (departure) to the first fix at the next one
+(arrival). Row ids follow insert order, not fix time: a late fix older than
+the bus's last departure is skipped rather than moving it backwards.
+
+Per segment and time-of-day bucket we keep count, mean and variance
+(Welford) plus streaming p50/p90 estimates (P² algorithm, five markers per
+quantile). The watermark, the per-bus "last stop" state and the touched
+stats are committed together, so a crashed run simply resumes.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import Bus, BusLocation, RollupState, SegmentStat, Stop
+from app.services.ingest_filter import haversine_m
+
+ROLLUP_NAME = "segments"
+BATCH_SIZE = 2000
+QUANTILES = (0.5, 0.9)
+
+
+class P2Quantile:
+    """P² streaming quantile estimator (Jain & Chlamtac); O(1) memory."""
+
+    def __init__(self, p: float, state: Optional[list] = None):
+        self.p = p
+        if state:
+            self.count, self.q, self.n, self.np = state
+        else:
+            self.count, self.q, self.n, self.np = 0, [], [], []
+
+    def to_state(self) -> list:
+        return [self.count, self.q, self.n, self.np]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q, n = self.q, self.n
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            if self.count == 5:
+                p = self.p
+                self.n = [1, 2, 3, 4, 5]
+                self.np = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        p = self.p
+        for i, dn in enumerate((0, p / 2, p, (1 + p) / 2, 1)):
+            self.np[i] += dn
+
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            return self.q[min(len(self.q) - 1, int(self.p * len(self.q)))]
+        return self.q[2]
+
+
+def time_bucket(ts: datetime) -> int:
+    local = ts + timedelta(minutes=settings.SEGMENT_TZ_OFFSET_MINUTES)
+    return (local.hour * 60 + local.minute) // settings.SEGMENT_BUCKET_MINUTES
+
+
+def record_traversal(stat: SegmentStat, seconds: float) -> None:
+    stat.count += 1
+    delta = seconds - stat.mean_s
+    stat.mean_s += delta / stat.count
+    stat.m2 += delta * (seconds - stat.mean_s)
+    stat.min_s = seconds if stat.min_s is None else min(stat.min_s, seconds)
+    stat.max_s = seconds if stat.max_s is None else max(stat.max_s, seconds)
+    # build fresh containers: mutating the loaded JSON in place would make the
+    # new value compare equal to the committed one and the update is skipped
+    sketches = {}
+    for p in QUANTILES:
+        state = (stat.quantiles or {}).get(str(p))
+        est = P2Quantile(p, [state[0], list(state[1]), list(state[2]), list(state[3])] if state else None)
+        est.add(seconds)
+        sketches[str(p)] = est.to_state()
+    stat.quantiles = sketches
+
+
+def quantile(stat: SegmentStat, p: float) -> Optional[float]:
+    state = (stat.quantiles or {}).get(str(p))
+    return P2Quantile(p, state).value() if state else None
+
+
+def _load_routes(session: Session) -> Tuple[Dict[int, int], Dict[int, List[Tuple[int, str, float, float]]]]:
+    bus_routes = {bid: rid for bid, rid in session.exec(select(Bus.id, Bus.route_id)) if rid is not None}
+    stops: Dict[int, List[Tuple[int, str, float, float]]] = {}
+    for rid, order, name, lat, lon in session.exec(
+        select(Stop.route_id, Stop.order, Stop.name, Stop.latitude, Stop.longitude).order_by(Stop.order, Stop.id)
+    ):
+        stops.setdefault(rid, []).append((order, name, lat, lon))
+    return bus_routes, stops
+
+
+def _stop_at(stops: List[Tuple[int, str, float, float]], lat: float, lon: float, reported: Optional[str]):
+    """The (position, name) of the stop this fix is at, if any; position indexes the ordered stop list."""
+    if reported:
+        for pos, (_order, name, _lat, _lon) in enumerate(stops):
+            if name == reported:
+                return pos, name
+    radius = settings.SEGMENT_STOP_RADIUS_METERS
+    for pos, (_order, name, slat, slon) in enumerate(stops):
+        if (slat or slon) and haversine_m(lat, lon, slat, slon) <= radius:
+            return pos, name
+    return None
+
+
+def run_segment_rollup(session: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Processes every BusLocation row after the watermark; returns rows consumed."""
+    rollup = session.get(RollupState, ROLLUP_NAME) or RollupState(name=ROLLUP_NAME, watermark=0, state={})
+    bus_state: Dict[str, dict] = {k: dict(v) for k, v in (rollup.state or {}).items()}
+    bus_routes, route_stops = _load_routes(session)
+    stats: Dict[Tuple[int, str, str, int], SegmentStat] = {}
+    max_seconds = settings.SEGMENT_MAX_SECONDS
+    processed = 0
+
+    def stat_for(key: Tuple[int, str, str, int]) -> SegmentStat:
+        stat = stats.get(key)
+        if stat is None:
+            route_id, from_stop, to_stop, bucket = key
+            stat = session.exec(
+                select(SegmentStat).where(
+                    SegmentStat.route_id == route_id,
+                    SegmentStat.from_stop == from_stop,
+                    SegmentStat.to_stop == to_stop,
+                    SegmentStat.bucket == bucket,
+                )
+            ).first() or SegmentStat(route_id=route_id, from_stop=from_stop, to_stop=to_stop, bucket=bucket)
+            stats[key] = stat
+        return stat
+
+    while True:
+        rows = session.exec(
+            select(
+                BusLocation.id, BusLocation.bus_id, BusLocation.latitude, BusLocation.longitude,
+                BusLocation.current_stop, BusLocation.timestamp,
+            )
+            .where(BusLocation.id > rollup.watermark)
+            .order_by(BusLocation.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        for loc_id, bus_id, lat, lon, reported, ts in rows:
+            rollup.watermark = loc_id
+            route_id = bus_routes.get(bus_id)
+            if route_id is None or ts is None:
+                continue
+            at = _stop_at(route_stops.get(route_id, []), lat, lon, reported)
+            if at is None:
+                continue
+            pos, name = at
+            key = str(bus_id)
+            prev = bus_state.get(key)
+            departed = datetime.fromisoformat(prev["left"]) if prev else None
+            if departed is not None and ts < departed:
+                continue  # late fix (retry / offline backlog): older than what we've already seen
+            if prev and prev["route"] == route_id and prev["stop"] == name:
+                prev["left"] = ts.isoformat()  # still at the stop: push departure time forward
+                continue
+            if prev and prev["route"] == route_id and prev.get("pos") is not None and pos == prev["pos"] + 1:
+                seconds = (ts - departed).total_seconds()
+                if 0 < seconds <= max_seconds:
+                    record_traversal(stat_for((route_id, prev["stop"], name, time_bucket(departed))), seconds)
+            bus_state[key] = {"route": route_id, "stop": name, "pos": pos, "left": ts.isoformat()}
+
+        processed += len(rows)
+        rollup.state = {k: dict(v) for k, v in bus_state.items()}
+        for stat in stats.values():
+            session.add(stat)
+        session.add(rollup)
+        session.commit()
+        stats.clear()  # committed rows are re-read on demand; keeps memory flat
+        if len(rows) < batch_size:
+            break
+
+    return processed
@@ -0,0 +1,83 @@
+# bench_serialization.py
+"""
+Compare the regular (ORM + response_model) and fast (?fast=true) paths of the
+hot list endpoints against a throwaway SQLite database.
+
+    python bench_serialization.py [buses] [stops_per_route] [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+tmpdir = tempfile.mkdtemp(prefix="shuttle-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ["TELEMETRY_DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'telemetry.db')}"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app import models  # noqa: E402
+from app.core import fastjson  # noqa: E402
+from app.services import read_cache  # noqa: E402
+from app.db.session import engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def populate(n_buses: int, stops_per_route: int) -> None:
+    init_db()
+    with Session(engine) as session:
+        for i in range(n_buses):
+            route = models.Route(name=f"Route {i}")
+            session.add(route)
+            session.flush()
+            for j in range(stops_per_route):
+                session.add(models.Stop(route_id=route.id, name=f"Stop {i}-{j}",
+                                        latitude=17.7 + j * 0.01, longitude=83.2 + j * 0.01, order=j))
+            session.add(models.Bus(name=f"Bus {i}", route_id=route.id))
+            session.add(models.Announcement(message=f"Announcement {i} " + "x" * 80))
+        session.commit()
+
+
+def bench(client: TestClient, url: str, iterations: int, headers=None, invalidate=None) -> float:
+    client.get(url, headers=headers)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if invalidate:
+            read_cache.bump(invalidate)
+        r = client.get(url, headers=headers)
+        r.raise_for_status()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    n_buses = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    stops = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    populate(n_buses, stops)
+    print(f"{n_buses} buses x {stops} stops, {iterations} iterations, "
+          f"encoder={'orjson' if fastjson.orjson else 'json'}")
+
+    with TestClient(app) as client:
+        identity = {"Accept-Encoding": "identity"}
+        for url, dataset in (
+            ("/buses", "buses"),
+            ("/routes/routes", "routes"),
+            ("/announcements/announcements", "announcements"),
+        ):
+            plain = client.get(url).json()
+            fast = client.get(url + "?fast=true").json()
+            assert plain == fast, f"fast path output differs for {url}"
+            regular_ms = bench(client, url, iterations, identity)
+            cold_ms = bench(client, url + "?fast=true", iterations, identity, invalidate=dataset)
+            warm_ms = bench(client, url + "?fast=true", iterations, identity)
+            raw = len(client.get(url + "?fast=true", headers=identity).content)
+            gzipped = client.get(url + "?fast=true", headers={"Accept-Encoding": "gzip"})
+            gz = int(gzipped.headers.get("content-length", 0))
+            print(f"{url:30s} regular {regular_ms:8.2f} ms | fast uncached {cold_ms:7.2f} ms "
+                  f"| fast cached {warm_ms:6.2f} ms | {raw} bytes ({gz} gzipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# tests/test_query_budgets.py
+"""
+SQL query / latency budgets for the read endpoints in app/routers/.
+
+Each entry is ``(max_queries, max_ms)``. Query counts are exact enough to
+catch an N+1 (the fixture creates enough buses and stops that per-row
+lazy loads blow the count); the millisecond budgets are loose, for CI
+machines. Run from shuttletrack-backend/::
+
+    python -m pytest -q tests
+"""
+import os
+import tempfile
+import threading
+
+# isolated databases, no background jobs: set before app.core.config is imported
+_tmp = tempfile.mkdtemp(prefix="shuttletrack-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_tmp}/shuttle.db",
+    "TELEMETRY_DATABASE_URL": f"sqlite:///{_tmp}/telemetry.db",
+    "LIVE_CHECKPOINT_PATH": "",
+    "SCHEDULER_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+})
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.core.profiling import QueryBudgetExceeded, assert_endpoint_budgets, query_budget  # noqa: E402
+from app.db.session import open_session  # noqa: E402
+from app.main import app  # noqa: E402
+
+EXTRA_ROUTES = 10
+STOPS_PER_ROUTE = 8
+BUSES_PER_ROUTE = 3
+
+PUBLIC_BUDGETS = {
+    ("GET", "/"): (0, 50),
+    ("GET", "/buses?fast=false"): (3, 200),
+    ("GET", "/buses?fast=true"): (3, 200),
+    ("GET", "/buses/1"): (3, 50),
+    ("GET", "/buses/1/location"): (1, 50),
+    ("GET", "/buses/nearby?lat=17.7&lon=83.3&radius=5000"): (0, 50),
+    ("GET", "/routes/routes?fast=false"): (1, 100),
+    ("GET", "/routes/routes?fast=true"): (1, 100),
+    ("GET", "/routes/routes/1"): (1, 50),
+    ("GET", "/routes/routes/1/geometry"): (2, 50),
+    ("GET", "/announcements/announcements?fast=false"): (1, 50),
+    ("GET", "/announcements/announcements?fast=true"): (1, 50),
+    ("GET", "/fleet/snapshot"): (0, 50),
+    ("GET", "/metrics"): (0, 100),
+}
+
+ADMIN_BUDGETS = {
+    ("GET", "/users"): (1, 50),
+    ("GET", "/feedback"): (1, 50),
+    ("GET", "/admin/summary"): (4, 100),
+    ("GET", "/admin/segments"): (1, 50),
+    ("GET", "/admin/profiles"): (0, 50),
+    ("GET", "/admin/export/locations?format=ndjson"): (1, 200),
+}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        with open_session() as session:
+            for r in range(EXTRA_ROUTES):
+                route = models.Route(name=f"Budget route {r}")
+                session.add(route)
+                session.flush()
+                for s in range(STOPS_PER_ROUTE):
+                    session.add(models.Stop(route_id=route.id, name=f"S{s}", latitude=17.7 + s * 0.01,
+                                            longitude=83.3, order=s))
+                for b in range(BUSES_PER_ROUTE):
+                    session.add(models.Bus(name=f"Budget bus {r}.{b}", route_id=route.id))
+            session.commit()
+        yield c
+
+
+@pytest.fixture(scope="module")
+def admin_headers(client):
+    token = client.post("/auth/login", json={"username": "admin", "password": "adminpass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_public_endpoint_budgets(client):
+    assert_endpoint_budgets(client, PUBLIC_BUDGETS)
+
+
+def test_admin_endpoint_budgets(client, admin_headers):
+    assert_endpoint_budgets(client, ADMIN_BUDGETS, headers=admin_headers)
+
+
+def test_budget_exceeded_lists_statements(client):
+    with pytest.raises(QueryBudgetExceeded, match="SQL statements"):
+        with query_budget(max_queries=0) as budget:
+            client.get("/buses?fast=false", headers=budget.headers)
+
+
+def test_budget_ignores_statements_outside_its_context(client):
+    def background_job():  # like a scheduler job: runs, but not on the budget's behalf
+        with open_session() as session:
+            session.exec(select(models.Bus)).all()
+
+    with query_budget(max_queries=0) as budget:
+        job = threading.Thread(target=background_job)
+        job.start()
+        job.join()
+    assert budget.statements == []
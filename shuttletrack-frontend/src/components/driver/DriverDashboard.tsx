@@ -7,6 +7,7 @@ import { Badge } from "../ui/badge";
 import { ViewRoutes } from "./ViewRoutes";
 import { toast } from "sonner";
 import api from "../../services/api";
+import { openDriverChannel } from "../../services/driverChannel";
 
 type Bus = { id: number; name?: string; color?: string };
 
@@ -49,10 +50,26 @@ export function DriverDashboard(): JSX.Element {
         return;
       }
 
+      // persistent channel; POST below is only the fallback while it's down
+      const channel = openDriverChannel(selectedBusId);
+
       const success = async (pos: GeolocationPosition) => {
         const latitude = pos.coords.latitude;
         const longitude = pos.coords.longitude;
 
+        if (
+          channel.send({
+            latitude,
+            longitude,
+            accuracy: pos.coords.accuracy ?? null,
+            speed: pos.coords.speed ?? null,
+            heading: pos.coords.heading ?? null,
+            timestamp: pos.timestamp,
+          })
+        ) {
+          return;
+        }
+
         // payload includes both short and long names to match backend examples
         const payload = {
           bus_id: selectedBusId,
@@ -96,6 +113,7 @@ export function DriverDashboard(): JSX.Element {
       console.info("Started geolocation watcher:", wid);
 
       return () => {
+        channel.close();
         if (watchIdRef.current !== null) {
           navigator.geolocation.clearWatch(watchIdRef.current);
           watchIdRef.current = null;
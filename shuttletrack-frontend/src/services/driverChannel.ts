@@ -0,0 +1,114 @@
+// src/services/driverChannel.ts
+import { getToken } from "../utils/auth";
+
+/**
+ * Persistent driver ingest channel: ws://host/ws/driver/{bus_id}?token=...
+ *
+ * Fixes are sent as compact arrays [seq, lat, lon, ts_ms, acc, spd, hdg].
+ * The server acks in batches ({type: "ack", seqs: [...]}) listing the fixes it
+ * holds; only those are dropped here. Unacked fixes (rate limited, filtered or
+ * failed to store) are kept (bounded) and re-sent after a reconnect. `send`
+ * returns false while the socket isn't open so callers can fall back to the
+ * HTTP POST.
+ */
+export type DriverFix = {
+  latitude: number;
+  longitude: number;
+  accuracy?: number | null;
+  speed?: number | null;
+  heading?: number | null;
+  timestamp?: number; // epoch ms
+};
+
+const MAX_UNACKED = 50;
+const SEQ_KEY = "driver_seq_";
+
+// Last seq used for this bus, persisted so a reload never restarts below the
+// server's high-water mark (which would turn fresh fixes into "late" ones).
+function initialSeq(busId: string | number): number {
+  let stored = 0;
+  try {
+    stored = Number(localStorage.getItem(SEQ_KEY + busId)) || 0;
+  } catch {}
+  // seconds-based floor covers a cleared storage; fits uint32 either way
+  return Math.max(stored, Math.floor(Date.now() / 1000));
+}
+
+function wsBase(): string {
+  return (
+    import.meta.env.VITE_BACKEND_WS_URL ||
+    `${location.protocol === "https:" ? "wss" : "ws"}://${location.hostname}:${location.port ? location.port : (location.protocol === "https:" ? "443" : "80")}`
+  );
+}
+
+export function openDriverChannel(busId: string | number) {
+  const token = getToken();
+  const url = `${wsBase()}/ws/driver/${busId}${token ? `?token=${encodeURIComponent(token)}` : ""}`;
+
+  let ws: WebSocket | null = null;
+  let seq = initialSeq(busId);
+  let unacked: any[][] = [];
+  let closed = false;
+  let attempts = 0;
+
+  const connect = () => {
+    ws = new WebSocket(url);
+    ws.onopen = () => {
+      attempts = 0;
+      if (unacked.length) ws?.send(JSON.stringify(unacked));
+    };
+    ws.onmessage = (e) => {
+      try {
+        const msg = JSON.parse(e.data);
+        // acked fixes are held by the server; rejected ones would be rejected again
+        if ((msg.type === "ack" || msg.type === "error") && Array.isArray(msg.seqs)) {
+          const done = new Set(msg.seqs);
+          unacked = unacked.filter((f) => !done.has(f[0]));
+        }
+      } catch {}
+    };
+    ws.onclose = (e) => {
+      ws = null;
+      // 1008 = not allowed for this bus; don't hammer the server
+      if (closed || e.code === 1008) return;
+      const delay = Math.min(30000, 1000 * 2 ** attempts++);
+      setTimeout(() => !closed && connect(), delay);
+    };
+    ws.onerror = () => {
+      try {
+        ws?.close();
+      } catch {}
+    };
+  };
+
+  connect();
+
+  return {
+    send(fix: DriverFix): boolean {
+      // only number fixes that actually go out on the channel
+      if (!ws || ws.readyState !== WebSocket.OPEN) return false;
+      const frame = [
+        ++seq,
+        fix.latitude,
+        fix.longitude,
+        fix.timestamp ?? Date.now(),
+        fix.accuracy ?? null,
+        fix.speed ?? null,
+        fix.heading ?? null,
+      ];
+      try {
+        localStorage.setItem(SEQ_KEY + busId, String(seq));
+      } catch {}
+      unacked.push(frame);
+      if (unacked.length > MAX_UNACKED) unacked.shift();
+      ws.send(JSON.stringify(frame));
+      return true;
+    },
+    close() {
+      closed = true;
+      try {
+        ws?.close();
+      } catch {}
+    },
+  };
+}